@@ -21,9 +21,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'shop.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -32,6 +33,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL/serializer/render timings (Server-Timing headers and
+# Prometheus histograms at /api/_metrics). Sync-only: under ASGI it moves each
+# request onto a thread, so leave it off when benchmarking the async views. Set METRICS_TOKEN to require
+# "Authorization: Bearer <token>" on the metrics endpoint.
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '0') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 ROOT_URLCONF = 'backend_django.urls'
 
 TEMPLATES = [
@@ -53,20 +61,72 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend_django.wsgi.application'
 ASGI_APPLICATION = 'backend_django.asgi.application'
 
+# SQLite concurrency tuning, applied to every new connection: WAL lets readers
+# run alongside the writer, busy_timeout makes a blocked writer wait instead of
+# failing with "database is locked", and IMMEDIATE transactions take the write
+# lock up front so two checkouts never deadlock upgrading their read locks.
+# SQLITE_TUNING=0 restores SQLite's stock behaviour.
+SQLITE_TUNING_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))};"
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA temp_store=MEMORY'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'ecommerce_dj.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'ecommerce_dj.sqlite3'),
+        'OPTIONS': dict(SQLITE_TUNING_OPTIONS) if os.environ.get('SQLITE_TUNING', '1') == '1' else {},
     }
 }
 
-# If DATABASE_URL is provided (Render/Postgres), use it
+# If DATABASE_URL is provided (Render/Postgres), use it. DB_POOL=1 switches from
+# persistent connections to a psycopg 3 pool per worker process (so the server
+# holds at most workers x DB_POOL_MAX_SIZE connections).
 db_url = os.environ.get('DATABASE_URL')
 if db_url:
-    DATABASES['default'] = dj_database_url.parse(db_url, conn_max_age=600, ssl_require=True)
+    db_pool = os.environ.get('DB_POOL') == '1'
+    DATABASES['default'] = dj_database_url.parse(db_url, conn_max_age=0 if db_pool else 600, ssl_require=True)
+    if db_pool and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '4')),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+
+# Cache (home snapshot, version counters, ETags). File based by default so an
+# invalidation made by one gunicorn worker is seen by all of them; CACHE_BACKEND=locmem
+# keeps everything in process memory for single-process development.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
+    }
+}
+if os.environ.get('CACHE_BACKEND') == 'locmem':
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shop',
+    }
+
+# Product list pages are cached for this many seconds (evicted earlier by the
+# writes that affect them); 0 turns the cache off
+PRODUCT_LIST_CACHE_TIMEOUT = int(os.environ.get('PRODUCT_LIST_CACHE_TIMEOUT', '300'))
+
+# ?category=<name> also matches products without a category_fk by their legacy
+# string, which no index serves; turn off once reconcile_product_categories has run
+PRODUCT_CATEGORY_LEGACY_MATCH = os.environ.get('PRODUCT_CATEGORY_LEGACY_MATCH', '1') == '1'
 
 AUTH_PASSWORD_VALIDATORS = []
 
+# Order numbers reserved per worker process in one counter update
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get('ORDER_NUMBER_BLOCK_SIZE', '20'))
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
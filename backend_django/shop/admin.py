@@ -5,15 +5,19 @@ from django.utils.html import format_html
 from django import forms
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from .cache import PRODUCT_LIST_TAG, invalidate
+from .images import variant_urls
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("id", "thumb", "name", "price", "category", "category_fk", "in_stock", "stock_qty", "low_stock_threshold", "notify_on_low_stock", "style_template")
     list_display_links = ("id", "thumb", "name")
-    list_editable = ("price", "category", "category_fk", "in_stock", "stock_qty", "low_stock_threshold", "notify_on_low_stock", "style_template")
+    list_editable = ("price", "category_fk", "in_stock", "stock_qty", "low_stock_threshold", "notify_on_low_stock", "style_template")
     search_fields = ("name", "description", "category", "category_fk__name", "category_fk__parent__name")
     list_filter = ("category", "category_fk", "category_fk__parent", "in_stock")
     autocomplete_fields = ("category_fk",)
+    # Mirrors category_fk (see Product.save)
+    readonly_fields = ("category",)
     actions = ["clone_products", "bulk_update"]
 
     class Media:
@@ -34,7 +38,11 @@ class ProductAdmin(admin.ModelAdmin):
             pass
 
     def thumb(self, obj: Product):
-        url = obj.image.url if obj.image else (obj.image_url or "")
+        variants = variant_urls(obj.image_variants) or {}
+        if 'thumb' in variants:
+            url = variants['thumb']['url']
+        else:
+            url = obj.image.url if obj.image else (obj.image_url or "")
         if not url:
             return ""
         return format_html('<img src="{}" style="height:40px;width:40px;object-fit:cover;border-radius:4px;"/>', url)
@@ -49,6 +57,7 @@ class ProductAdmin(admin.ModelAdmin):
                 price=obj.price,
                 image_url=obj.image_url,
                 image=obj.image,
+                image_variants=obj.image_variants,
                 category=obj.category,
                 category_fk=obj.category_fk,
                 in_stock=obj.in_stock,
@@ -56,6 +65,7 @@ class ProductAdmin(admin.ModelAdmin):
             created_objs.append(clone)
         if created_objs:
             Product.objects.bulk_create(created_objs)
+            invalidate('home', 'product', PRODUCT_LIST_TAG)
         self.message_user(request, f"Cloned {len(created_objs)} product(s)")
     clone_products.short_description = "Clone selected products"
 
@@ -67,6 +77,7 @@ class ProductAdmin(admin.ModelAdmin):
         if category_id:
             try:
                 updates['category_fk'] = Category.objects.get(pk=category_id)
+                updates['category'] = updates['category_fk'].name
             except Category.DoesNotExist:
                 pass
         if in_stock_val in ('true', 'false'):
@@ -78,6 +89,7 @@ class ProductAdmin(admin.ModelAdmin):
                 pass
         if updates:
             count = queryset.update(**updates)
+            invalidate('home', 'product', PRODUCT_LIST_TAG)
             self.message_user(request, f"Updated {count} product(s)")
         else:
             self.message_user(request, "No changes applied", level=messages.WARNING)
@@ -311,8 +323,8 @@ class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     autocomplete_fields = ("product",)
-    fields = ("product", "quantity", "price", "line_total_display")
-    readonly_fields = ("line_total_display",)
+    fields = ("product", "product_name", "quantity", "price", "line_total_display")
+    readonly_fields = ("product_name", "line_total_display")
 
     def line_total_display(self, obj: OrderItem):
         try:
@@ -328,11 +340,12 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     search_fields = ("order_number", "customer_name", "customer_email", "customer_phone", "address", "city")
     readonly_fields = ("created_at", "updated_at", "order_number")
+    raw_id_fields = ("user",)
     inlines = [OrderItemInline]
 
     fieldsets = (
         (None, {"fields": ("status",)}),
-        ("Customer", {"fields": (("customer_name", "customer_email", "customer_phone"), ("address",), ("city", "postal_code"))}),
+        ("Customer", {"fields": ("user", ("customer_name", "customer_email", "customer_phone"), ("address",), ("city", "postal_code"))}),
         ("Totals", {"fields": ("total",)}),
         ("Identifiers", {"fields": ("order_number",)}),
         ("Timestamps", {"fields": ("created_at", "updated_at")}),
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import checks, signals  # noqa: F401
+
+        post_migrate.connect(signals.ensure_search_index, sender=self)
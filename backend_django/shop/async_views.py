@@ -0,0 +1,132 @@
+"""Async twins of the hot read endpoints, served under ``/api/async/``.
+
+They return the same payloads and ETags as the DRF views but never block the
+event loop on the database: queries go through Django's async ORM and cache
+reads through ``cache.aget``. Run under ASGI (``SERVER_MODE=asgi sh start.sh``)
+to get the benefit; under WSGI Django simply runs them in a fresh event loop.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .cache import (
+    acategory_ids_for_name, aget_category_tree, aget_home_snapshot, aget_product_list_page, aget_version, aset_product_list_page, aversion_etag,
+    product_list_key, product_list_tags, product_version_name, sparse_fields,
+)
+from .filters import filter_products, product_filters
+from .models import PaymentGateway, PaymentSetting, Product
+from .pagination import KeysetPagination
+from .search import asearch_backend
+from .serializers import (
+    PaymentGatewaySerializer, PaymentSettingSerializer, ProductCardSerializer, ProductSerializer, style_template_map,
+)
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def _conditional(request, etag, build):
+    """Same semantics as ``@condition(etag_func=...)`` on the sync views, with an async ETag lookup."""
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    response = await build()
+    if response.status_code == 200:
+        response['ETag'] = etag
+    return response
+
+
+@require_safe
+async def home(request):
+    version = await aget_version('home')
+
+    async def build():
+        return HttpResponse(await aget_home_snapshot(version), content_type='application/json')
+    return await _conditional(request, f'home-{version}', build)
+
+
+@require_safe
+async def product_list(request):
+    drf_request = Request(request)
+    card = (request.GET.get('view') or '').lower() == 'card'
+    filters = product_filters(request.GET)
+    paginator = KeysetPagination()
+    cached = None
+    if settings.PRODUCT_LIST_CACHE_TIMEOUT:
+        key = product_list_key(drf_request, filters, paginator.get_page_size(drf_request), card=card)
+        cached, versions = await aget_product_list_page(key, product_list_tags(filters))
+    if cached is not None:
+        paginator.restore_page(drf_request, cached['state'])
+        data = paginator.get_paginated_response(cached['results']).data
+        if 'style_templates' in cached:
+            data['style_templates'] = cached['style_templates']
+        response = _json(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    category_ids = await acategory_ids_for_name(filters['category']) if 'category' in filters else None
+    if 'q' in filters:
+        # Probes the schema once per process; filter_products then finds it memoized
+        await asearch_backend(Product.objects.db)
+    qs = filter_products(Product.objects.select_related('style_template').order_by('id'), filters, category_ids=category_ids)
+    try:
+        page = await paginator.apaginate_queryset(qs, drf_request)
+    except NotFound as exc:
+        return _json({'detail': str(exc.detail)}, status=404)
+    serializer = ProductCardSerializer if card else ProductSerializer
+    results = serializer(page, many=True, context={'request': drf_request}).data
+    data = paginator.get_paginated_response(results).data
+    if card:
+        data['style_templates'] = style_template_map(page)
+    response = _json(data)
+    if settings.PRODUCT_LIST_CACHE_TIMEOUT:
+        entry = {'state': paginator.page_state(), 'results': list(results)}
+        if card:
+            entry['style_templates'] = data['style_templates']
+        await aset_product_list_page(key, versions, entry)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+@require_safe
+async def product_detail(request, pk):
+    async def build():
+        try:
+            product = await Product.objects.select_related('style_template').aget(pk=pk)
+        except Product.DoesNotExist:
+            return _json({'detail': 'No Product matches the given query.'}, status=404)
+        return _json(ProductSerializer(product, context={'request': Request(request)}).data)
+    etag = await aversion_etag('product', product_version_name(pk), extra=sparse_fields(request.GET))
+    return await _conditional(request, etag, build)
+
+
+@require_safe
+async def category_tree(request):
+    counts = (request.GET.get('counts') or '').lower() in ('1', 'true', 'yes')
+    etag = await (aversion_etag('category', 'product', extra='counts') if counts else aversion_etag('category'))
+
+    async def build():
+        return _json(await aget_category_tree(with_counts=counts))
+    return await _conditional(request, etag, build)
+
+
+@require_safe
+async def payment_settings(request):
+    async def build():
+        obj, _ = await PaymentSetting.objects.aget_or_create(defaults={"enabled": True})
+        return _json(PaymentSettingSerializer(obj).data)
+    return await _conditional(request, await aversion_etag('payment_setting'), build)
+
+
+@require_safe
+async def payment_gateways(request):
+    async def build():
+        gateways = [g async for g in PaymentGateway.objects.filter(enabled=True).order_by('order', 'id')]
+        return _json(PaymentGatewaySerializer(gateways, many=True).data)
+    return await _conditional(request, await aversion_etag('payment_gateway'), build)
@@ -0,0 +1,185 @@
+import contextlib
+import math
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+
+
+@contextlib.contextmanager
+def benchmark_database(keep=False):
+    """Run the block against a throwaway, fully migrated copy of the default database.
+
+    SQLite gets an on-disk file rather than the shared in-memory test database so
+    concurrent writers behave as they would in production.
+    """
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='shop-bench-')
+        test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    setup_test_environment()
+    # Private in-memory cache: never let benchmark data reach the shared cache
+    cache_override = override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shop-bench'},
+    })
+    cache_override.enable()
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        yield connection.settings_dict['NAME']
+    finally:
+        cache_override.disable()
+        connection.close()
+        if not keep:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        else:
+            connection.settings_dict['NAME'] = old_name
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+        if tmpdir and not keep:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(math.ceil(pct / 100.0 * len(ordered))) - 1))
+    return ordered[k]
+
+
+def generate_catalogue(products=10000, categories=200, depth=4, sections=8, carousels=3, orders=1000,
+                       lines_per_order=3, batch_size=5000, seed=42, log=None):
+    """Fill the current database with a synthetic shop of the given scale.
+
+    Categories form ``depth`` levels under a handful of roots; products are spread
+    over all of them. Returns a dict of ids useful to drive the API.
+    """
+    import random
+    from decimal import Decimal
+
+    from django.contrib.auth.models import User
+
+    from .models import (
+        Carousel, CarouselCategorySource, CarouselSlide, Category, HomeCarouselSection, HomeSection, Menu,
+        MenuItem, Order, OrderItem, PaymentGateway, PaymentSetting, Product, ProductStyleTemplate, SiteSetting,
+    )
+
+    rnd = random.Random(seed)
+    log = log or (lambda msg: None)
+    words = ["red", "blue", "green", "cotton", "steel", "classic", "smart", "mini", "pro", "eco",
+             "lamp", "shirt", "phone", "chair", "watch", "bottle", "bag", "shoe", "cable", "mug"]
+
+    # Categories: breadth-first, roughly equal branching per level
+    roots = max(1, min(categories, 5))
+    per_level = max(2, round((max(categories, 1) / roots) ** (1.0 / max(depth - 1, 1))))
+    level = Category.objects.bulk_create(Category(name=f"Root {i}") for i in range(roots))
+    all_categories = list(level)
+    while len(all_categories) < categories and level:
+        children = []
+        for parent in level:
+            for j in range(per_level):
+                if len(all_categories) + len(children) >= categories:
+                    break
+                children.append(Category(name=f"{parent.name}.{j}", parent=parent))
+        level = Category.objects.bulk_create(children)
+        all_categories.extend(level)
+    # bulk_create skips Category.save(), which maintains the paths
+    Category.rebuild_paths()
+    log(f"categories: {len(all_categories)}")
+
+    templates = ProductStyleTemplate.objects.bulk_create(ProductStyleTemplate(name=f"Style {i}") for i in range(5))
+
+    created = 0
+    while created < products:
+        batch = []
+        for i in range(created, min(products, created + batch_size)):
+            cat = rnd.choice(all_categories)
+            name = " ".join(rnd.sample(words, 3))
+            batch.append(Product(
+                name=f"{name} {i}",
+                description=" ".join(rnd.choices(words, k=12)),
+                price=Decimal(rnd.randint(100, 100000)) / 100,
+                category=cat.name,
+                category_fk=cat,
+                stock_qty=rnd.randint(0, 500),
+                popularity=rnd.randint(0, 10000),
+                trend_score=rnd.randint(0, 1000),
+                style_template=rnd.choice(templates),
+            ))
+        Product.objects.bulk_create(batch)
+        created += len(batch)
+        log(f"products: {created}/{products}")
+    product_ids = list(Product.objects.values_list("id", flat=True))
+    prices, names = {}, {}
+    for pid, price, name in Product.objects.values_list("id", "price", "name"):
+        prices[pid], names[pid] = price, name
+
+    site = SiteSetting.objects.first() or SiteSetting.objects.create(home_product_limit=12)
+    menu = Menu.objects.create(name="Main")
+    MenuItem.objects.bulk_create(MenuItem(menu=menu, label=f"Link {i}", url=f"/page/{i}", order=i) for i in range(6))
+    site.primary_menu = menu
+    site.save()
+    kinds = [k for k, _ in HomeSection.KIND_CHOICES]
+    HomeSection.objects.bulk_create(
+        HomeSection(site=site, title=f"Section {i}", kind=kinds[i % len(kinds)], category=rnd.choice(all_categories),
+                    limit=12, order=i)
+        for i in range(sections)
+    )
+    orderings = [o for o, _ in CarouselCategorySource.ORDERING_CHOICES]
+    for i in range(carousels):
+        carousel = Carousel.objects.create(site=site, title=f"Carousel {i}", order=i)
+        CarouselSlide.objects.bulk_create(
+            CarouselSlide(carousel=carousel, image_url=f"https://example.com/slide-{i}-{j}.jpg", order=j) for j in range(2)
+        )
+        CarouselCategorySource.objects.bulk_create(
+            CarouselCategorySource(carousel=carousel, category=rnd.choice(all_categories), limit=8,
+                                   ordering=orderings[(i + j) % len(orderings)], order=j)
+            for j in range(2)
+        )
+        HomeCarouselSection.objects.create(site=site, carousel=carousel, order=i)
+
+    PaymentSetting.objects.get_or_create(defaults={"enabled": True})
+    PaymentGateway.objects.bulk_create(
+        PaymentGateway(name=f"Gateway {i}", code=f"gw{i}", order=i) for i in range(3)
+    )
+
+    # The "bench" user owns the orders placed with the first customer email
+    user = User.objects.create_user(username="bench", email="bench@example.com", password="bench-password")
+    emails = [f"customer{i}@example.com" for i in range(max(1, orders // 10))]
+    created = 0
+    while created < orders:
+        count = min(batch_size, orders - created)
+        picked = [rnd.choice(emails) for _ in range(count)]
+        batch = Order.objects.bulk_create(
+            Order(customer_name=f"Customer {created + i}", customer_email=email,
+                  user=user if email == emails[0] else None, order_number=f"BENCH-{created + i:08d}")
+            for i, email in enumerate(picked)
+        )
+        items = []
+        for order in batch:
+            total = 0
+            for pid in rnd.sample(product_ids, min(lines_per_order, len(product_ids))):
+                qty = rnd.randint(1, 3)
+                items.append(OrderItem(order=order, product_id=pid, product_name=names[pid], quantity=qty, price=prices[pid]))
+                total += prices[pid] * qty
+            order.total = total
+        OrderItem.objects.bulk_create(items)
+        Order.objects.bulk_update(batch, ["total"])
+        created += count
+        log(f"orders: {created}/{orders}")
+
+    return {
+        "product_ids": product_ids,
+        "category_ids": [c.id for c in all_categories],
+        "root_category_ids": [c.id for c in all_categories if c.parent_id is None],
+        "order_ids": list(Order.objects.values_list("id", flat=True)[:100]),
+        "customer_email": emails[0],
+        "user": user,
+        "search_word": words[0],
+    }
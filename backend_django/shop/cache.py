@@ -0,0 +1,340 @@
+import hashlib
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+VERSION_KEY = 'shop:version:{}'
+HOME_SNAPSHOT_KEY = 'shop:home:{}'
+HOME_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+CATEGORY_TREE_KEY = 'shop:category-tree:{}:{}'
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+CATEGORY_NAMES_KEY = 'shop:category-names:{}'
+PRODUCT_LIST_KEY = 'shop:product-list:{}'
+
+
+def _initial_version() -> int:
+    # Seed from the clock so a counter lost to eviction never comes back with
+    # a value that an older cached entry was stored under.
+    return int(time.time() * 1000)
+
+
+def get_version(name: str) -> int:
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(name: str) -> int:
+    key = VERSION_KEY.format(name)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _initial_version(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(name: str) -> int:
+    key = VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def product_version_name(pk) -> str:
+    # Per-product counter for writes that touch a few rows, such as stock taken at
+    # checkout; the global 'product' counter is for changes listings can see.
+    return f'product:{pk}'
+
+
+# Home page snapshot: the fully rendered HomeConfigSerializer payload, stored
+# as JSON bytes under the current "home" version.
+
+def build_home_snapshot() -> bytes:
+    from rest_framework.renderers import JSONRenderer
+    from .metrics import timer
+    from .models import SiteSetting
+    from .serializers import HomeConfigSerializer
+
+    site = SiteSetting.objects.first()
+    if not site:
+        site = SiteSetting.objects.create(home_product_limit=12)
+    data = HomeConfigSerializer(instance=site).data
+    with timer('render'):
+        return JSONRenderer().render(data)
+
+
+def get_home_snapshot() -> bytes:
+    key = HOME_SNAPSHOT_KEY.format(get_version('home'))
+    body = cache.get(key)
+    if body is None:
+        body = build_home_snapshot()
+        cache.set(key, body, HOME_SNAPSHOT_TIMEOUT)
+    return body
+
+
+async def aget_home_snapshot(version=None) -> bytes:
+    if version is None:
+        version = await aget_version('home')
+    body = await cache.aget(HOME_SNAPSHOT_KEY.format(version))
+    if body is None:
+        # Serializers walk relations synchronously: build in a worker thread
+        body = await sync_to_async(get_home_snapshot)()
+    return body
+
+
+_rebuild_lock = threading.Lock()
+_rebuild_state = {'running': False, 'dirty': False}
+
+
+def _rebuild_worker():
+    try:
+        while True:
+            with _rebuild_lock:
+                if not _rebuild_state['dirty']:
+                    _rebuild_state['running'] = False
+                    return
+                _rebuild_state['dirty'] = False
+            try:
+                get_home_snapshot()
+            except Exception:
+                # The next request rebuilds the snapshot synchronously.
+                pass
+    finally:
+        connections.close_all()
+
+
+def schedule_home_rebuild():
+    # Coalesce bursts of admin saves into as few rebuilds as possible.
+    with _rebuild_lock:
+        _rebuild_state['dirty'] = True
+        if _rebuild_state['running']:
+            return
+        _rebuild_state['running'] = True
+    threading.Thread(target=_rebuild_worker, name='home-snapshot', daemon=True).start()
+
+
+def version_etag(*names: str, extra='') -> str:
+    """ETag value derived from version counters; changes whenever any of them is bumped."""
+    parts = [f"{name}-{get_version(name)}" for name in names]
+    if extra:
+        parts.append(str(extra))
+    return '.'.join(parts)
+
+
+async def aversion_etag(*names: str, extra='') -> str:
+    parts = [f"{name}-{await aget_version(name)}" for name in names]
+    if extra:
+        parts.append(str(extra))
+    return '.'.join(parts)
+
+
+def invalidate(*names: str):
+    def _bump():
+        for name in names:
+            bump_version(name)
+        if 'home' in names:
+            schedule_home_rebuild()
+    # Bump only after commit so a rebuild never caches uncommitted data.
+    transaction.on_commit(_bump)
+
+
+def invalidate_home():
+    invalidate('home')
+
+
+# Category tree: built from one flat query, cached per "category" version (and
+# "product" version when product counts are included).
+
+def get_category_tree(with_counts: bool = False):
+    from .loaders import build_category_tree
+
+    if with_counts:
+        key = CATEGORY_TREE_KEY.format(get_version('category'), get_version('product'))
+    else:
+        key = CATEGORY_TREE_KEY.format(get_version('category'), 'nocounts')
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_category_tree(with_counts=with_counts)
+        cache.set(key, tree, CATEGORY_TREE_TIMEOUT)
+    return tree
+
+
+def _category_name_key(name: str) -> str:
+    return ' '.join(name.split()).lower()
+
+
+def get_category_names() -> dict:
+    """``{normalized name: [category ids]}`` for every category, cached per "category" version."""
+    from .models import Category
+
+    key = CATEGORY_NAMES_KEY.format(get_version('category'))
+    names = cache.get(key)
+    if names is None:
+        names = {}
+        for pk, name in Category.objects.order_by('id').values_list('id', 'name'):
+            names.setdefault(_category_name_key(name), []).append(pk)
+        cache.set(key, names, CATEGORY_TREE_TIMEOUT)
+    return names
+
+
+def category_ids_for_name(name: str) -> list:
+    return get_category_names().get(_category_name_key(name), [])
+
+
+async def acategory_ids_for_name(name: str) -> list:
+    names = await cache.aget(CATEGORY_NAMES_KEY.format(await aget_version('category')))
+    if names is None:
+        names = await sync_to_async(get_category_names)()
+    return names.get(_category_name_key(name), [])
+
+
+async def aget_category_tree(with_counts: bool = False):
+    if with_counts:
+        key = CATEGORY_TREE_KEY.format(await aget_version('category'), await aget_version('product'))
+    else:
+        key = CATEGORY_TREE_KEY.format(await aget_version('category'), 'nocounts')
+    tree = await cache.aget(key)
+    if tree is None:
+        tree = await sync_to_async(get_category_tree)(with_counts)
+    return tree
+
+
+# Product list pages, keyed on the normalized query and tagged with the scope
+# they were filtered on. Tags are ordinary version counters: an entry is served
+# only while every tag still has the version it was stored under, so a write
+# evicts just the lists it can change (the product's old and new categories
+# plus the lists not scoped to a category) and leaves the rest warm.
+
+PRODUCT_LIST_TAG = 'product-list'  # every list page: bulk writes, style templates
+PRODUCT_LIST_UNSCOPED_TAG = 'product-list:unscoped'
+
+
+def _name_tag(name: str) -> str:
+    # Category names may hold spaces or be long; cache keys may not
+    digest = hashlib.md5(_category_name_key(name).encode('utf-8')).hexdigest()[:16]
+    return f'product-list:category-name:{digest}'
+
+
+def product_list_tags(filters: dict) -> list:
+    tags = [PRODUCT_LIST_TAG]
+    if 'category_id' in filters:
+        tags.append(f"product-list:category:{filters['category_id']}")
+    if 'category' in filters:
+        tags.append(_name_tag(filters['category']))
+    if len(tags) == 1:
+        tags.append(PRODUCT_LIST_UNSCOPED_TAG)
+    return tags
+
+
+def product_state_tags(category='', category_id=None, category_name='', category_path='') -> set:
+    """Tags of the lists a product with these category values can appear in.
+
+    ``category_path`` adds the ancestors, whose lists include their subcategories' products.
+    """
+    tags = {PRODUCT_LIST_UNSCOPED_TAG}
+    ids = {str(category_id)} if category_id else set()
+    ids.update(part for part in (category_path or '').split('/') if part)
+    for cid in ids:
+        tags.add(f'product-list:category:{cid}')
+    for name in (category, category_name):
+        if name:
+            tags.add(_name_tag(name))
+    return tags
+
+
+def invalidate_product_lists(product_ids=None):
+    """Evict the list pages that can show ``product_ids`` (after a queryset update); all of them when None."""
+    if product_ids is None:
+        invalidate(PRODUCT_LIST_TAG)
+        return
+    from .models import Product
+
+    tags = set()
+    rows = Product.objects.filter(id__in=list(product_ids)).values_list(
+        'category', 'category_fk_id', 'category_fk__name', 'category_fk__path'
+    )
+    for row in rows:
+        tags |= product_state_tags(*row)
+    if tags:
+        invalidate(*sorted(tags))
+
+
+def sparse_fields(params) -> str:
+    """Normalized ``fields=`` / ``exclude=`` selection, for keys and ETags of sparse responses."""
+    parts = []
+    for name in ('fields', 'exclude'):
+        selected = sorted(set((params.get(name) or '').replace(' ', '').split(',')) - {''})
+        if selected:
+            parts.append(f"{name}={','.join(selected)}")
+    return ';'.join(parts)
+
+
+def product_list_key(request, filters: dict, page_size: int, card: bool = False) -> str:
+    params = request.query_params
+    parts = {
+        # Payloads carry absolute URLs
+        'base': request.build_absolute_uri('/'),
+        'filters': filters,
+        'page_size': page_size,
+        'cursor': params.get('cursor') or '',
+        'card': card,
+        'sparse': sparse_fields(params),
+    }
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return PRODUCT_LIST_KEY.format(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def _tag_versions(found, tags):
+    return {tag: found.get(VERSION_KEY.format(tag)) for tag in tags}
+
+
+def _cached_page(key, tags, found):
+    from .metrics import registry
+
+    versions = _tag_versions(found, tags)
+    entry = found.get(key)
+    if entry is not None and None not in versions.values() and entry['tags'] == versions:
+        registry.count_cache('product_list', 'hit')
+        return entry['page'], versions
+    registry.count_cache('product_list', 'miss')
+    return None, versions
+
+
+def get_product_list_page(key: str, tags: list):
+    """``(page, versions)``: the cached page (or None) and the tag versions to store a fresh one under."""
+    found = cache.get_many([key] + [VERSION_KEY.format(tag) for tag in tags])
+    page, versions = _cached_page(key, tags, found)
+    for tag, version in versions.items():
+        if version is None:
+            versions[tag] = get_version(tag)
+    return page, versions
+
+
+async def aget_product_list_page(key: str, tags: list):
+    found = await cache.aget_many([key] + [VERSION_KEY.format(tag) for tag in tags])
+    page, versions = _cached_page(key, tags, found)
+    for tag, version in versions.items():
+        if version is None:
+            versions[tag] = await aget_version(tag)
+    return page, versions
+
+
+def set_product_list_page(key: str, versions: dict, page: dict):
+    # Versions were read before the queryset ran, so a write racing the
+    # request leaves an entry that is already stale instead of one that hides it.
+    cache.set(key, {'tags': versions, 'page': page}, settings.PRODUCT_LIST_CACHE_TIMEOUT)
+
+
+async def aset_product_list_page(key: str, versions: dict, page: dict):
+    await cache.aset(key, {'tags': versions, 'page': page}, settings.PRODUCT_LIST_CACHE_TIMEOUT)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    # Version counters, the home snapshot and cached list pages are invalidated by
+    # bumping a counter in the default cache; a per-process cache only sees the
+    # bumps made by its own worker.
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            f'The default cache ({backend}) is private to each process, so cache invalidations '
+            'made by one worker are not seen by the others.',
+            hint='Use a shared cache (the file cache from CACHE_DIR, Redis, memcached) when running '
+                 'more than one worker.',
+            id='shop.W001',
+        )
+    ]
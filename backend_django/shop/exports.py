@@ -0,0 +1,138 @@
+import csv
+import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderItem
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_CHUNK_SIZE = 500
+
+ORDER_FIELDS = ('id', 'order_number', 'status', 'created_at', 'updated_at', 'customer_name', 'customer_email',
+                'customer_phone', 'address', 'city', 'postal_code', 'total')
+ITEM_FIELDS = ('product_id', 'product_name', 'quantity', 'price')
+CSV_HEADER = ORDER_FIELDS + tuple(f'item_{f}' for f in ITEM_FIELDS)
+
+
+def _moment(value, end=False):
+    """Parse an ISO date or datetime; a bare date used as an upper bound covers that whole day."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value!r}")
+        moment = datetime.datetime.combine(day + datetime.timedelta(days=1 if end else 0), datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_filters(params):
+    """Normalize ``from``/``to``/``status`` query params (or command options); raises ValueError."""
+    statuses = [s.strip() for s in (params.get('status') or '').split(',') if s.strip()]
+    valid = {choice for choice, _ in Order.STATUS_CHOICES}
+    unknown = [s for s in statuses if s not in valid]
+    if unknown:
+        raise ValueError(f"Unknown status: {', '.join(unknown)}")
+    return {
+        'created_from': _moment(params.get('from')),
+        'created_to': _moment(params.get('to'), end=True),
+        'statuses': statuses,
+    }
+
+
+def export_queryset(filters):
+    qs = Order.objects.all()
+    if filters.get('created_from'):
+        qs = qs.filter(created_at__gte=filters['created_from'])
+    if filters.get('created_to'):
+        # Bare dates were already moved to the next midnight
+        qs = qs.filter(created_at__lt=filters['created_to'])
+    if filters.get('statuses'):
+        qs = qs.filter(status__in=filters['statuses'])
+    return qs
+
+
+def iter_orders(qs, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield orders with their items prefetched, ``chunk_size`` at a time.
+
+    Chunks are fetched by keyset (``id > last``) rather than one long-lived
+    cursor, so each chunk is two short queries and memory stays flat however
+    many orders match.
+    """
+    items = Prefetch(
+        'items',
+        queryset=OrderItem.objects.only('id', 'order_id', 'product_id', 'product_name', 'quantity', 'price').order_by('id'),
+    )
+    qs = qs.order_by('id').prefetch_related(items)
+    last = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last = chunk[-1].id
+
+
+def order_record(order):
+    record = {field: getattr(order, field) for field in ORDER_FIELDS}
+    record['items'] = [
+        {'product_id': item.product_id, 'product_name': item.product_name, 'quantity': item.quantity, 'price': item.price}
+        for item in order.items.all()
+    ]
+    return record
+
+
+def render_ndjson(orders):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for order in orders:
+        yield encoder.encode(order_record(order)) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(orders):
+    """One row per order line; orders without lines get a single row with empty item columns."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in orders:
+        record = order_record(order)
+        head = [_csv_value(record[f]) for f in ORDER_FIELDS]
+        lines = record['items'] or [dict.fromkeys(ITEM_FIELDS, '')]
+        yield ''.join(writer.writerow(head + [_csv_value(line[f]) for f in ITEM_FIELDS]) for line in lines)
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def render_orders(orders, fmt):
+    return render_csv(orders) if fmt == 'csv' else render_ndjson(orders)
+
+
+async def astream(chunks, batch_size=EXPORT_CHUNK_SIZE):
+    """Async iterator over a ``render_orders`` generator, for responses served over ASGI.
+
+    Django buffers a sync iterator in full before sending it under ASGI. Here each
+    step renders up to ``batch_size`` pieces in the sync thread, where the ORM runs.
+    """
+    def take():
+        return ''.join(islice(chunks, batch_size))
+
+    while True:
+        part = await sync_to_async(take)()
+        if not part:
+            return
+        yield part
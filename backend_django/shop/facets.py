@@ -0,0 +1,90 @@
+import hashlib
+import json
+from decimal import ROUND_CEILING, Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, Max, Min, Value
+from django.db.models.functions import Cast, Floor, Least
+
+from .cache import get_version
+from .filters import filter_products
+from .models import Product
+
+FACETS_KEY = 'shop:facets:{}:{}:{}'
+FACETS_TIMEOUT = 60 * 10
+DEFAULT_BUCKETS = 10
+MAX_BUCKETS = 50
+
+
+def _category_facet(filters):
+    qs = filter_products(Product.objects.all(), filters, skip=('category',), rank=False)
+    rows = (
+        qs.filter(category_fk__isnull=False)
+        .values('category_fk_id', 'category_fk__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'category_fk__name')
+    )
+    return [{'id': r['category_fk_id'], 'name': r['category_fk__name'], 'count': r['count']} for r in rows]
+
+
+def _stock_facet(filters):
+    qs = filter_products(Product.objects.all(), filters, rank=False)
+    counts = {row['in_stock']: row['count'] for row in qs.values('in_stock').annotate(count=Count('id')).order_by()}
+    return {'true': counts.get(True, 0), 'false': counts.get(False, 0)}
+
+
+def _price_facet(filters, buckets):
+    qs = filter_products(Product.objects.all(), filters, skip=('price',), rank=False).order_by()
+    bounds = qs.aggregate(low=Min('price'), high=Max('price'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return {'min': None, 'max': None, 'buckets': []}
+    cents = Decimal('0.01')
+    low, high = Decimal(low).quantize(cents), Decimal(high).quantize(cents)
+    width = ((high - low) / buckets).quantize(cents, rounding=ROUND_CEILING) or cents
+    index = Least(
+        Cast(Floor((F('price') - Value(low)) / Value(width)), IntegerField()),
+        Value(buckets - 1),
+    )
+    counts = {row['bucket']: row['count'] for row in qs.annotate(bucket=index).values('bucket').annotate(count=Count('id')).order_by()}
+    return {
+        'min': str(low),
+        'max': str(high),
+        'buckets': [
+            {
+                'min': str(low + width * i),
+                'max': str(high if i == buckets - 1 else low + width * (i + 1)),
+                'count': counts.get(i, 0),
+            }
+            for i in range(buckets)
+        ],
+    }
+
+
+def compute_facets(filters, buckets=DEFAULT_BUCKETS):
+    """Facet counts for the current selection using grouped aggregate queries only.
+
+    Each facet ignores its own filter group so the sidebar can show alternatives:
+    categories are counted without the category selection and the price
+    histogram without the price range.
+    """
+    total = filter_products(Product.objects.all(), filters, rank=False).order_by().count()
+    return {
+        'total': total,
+        'categories': _category_facet(filters),
+        'in_stock': _stock_facet(filters),
+        'price': _price_facet(filters, buckets),
+    }
+
+
+def get_facets(filters, buckets=DEFAULT_BUCKETS):
+    buckets = max(1, min(int(buckets), MAX_BUCKETS))
+    # Ordering does not change counts; keep it out of the cache key
+    key_filters = {k: v for k, v in filters.items() if k != 'ordering'}
+    digest = hashlib.sha1(json.dumps([key_filters, buckets], sort_keys=True).encode('utf-8')).hexdigest()
+    key = FACETS_KEY.format(get_version('product'), get_version('category'), digest)
+    data = cache.get(key)
+    if data is None:
+        data = compute_facets(key_filters, buckets)
+        cache.set(key, data, FACETS_TIMEOUT)
+    return data
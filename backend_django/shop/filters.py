@@ -0,0 +1,94 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+
+from .cache import category_ids_for_name
+from .models import category_subtree
+from .search import search_products
+
+PRODUCT_ORDERINGS = {
+    'newest': ('-id',),
+    'oldest': ('id',),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+    'popular': ('-popularity', '-id'),
+    'trend': ('-trend_score', '-id'),
+}
+
+PRICE_MAX_DIGITS = 10
+
+
+def _price(value):
+    if value in (None, ''):
+        return None
+    try:
+        price = Decimal(str(value).strip())
+        # quantize raises for exponents like 1e30 that no longer fit the context
+        price = price.quantize(Decimal('0.01')) if price.is_finite() else None
+    except (InvalidOperation, ValueError):
+        return None
+    # Product.price is DecimalField(max_digits=10); Postgres rejects larger bounds
+    if price is None or len(price.as_tuple().digits) > PRICE_MAX_DIGITS:
+        return None
+    return price
+
+
+def product_filters(params) -> dict:
+    """Normalize product list query parameters; unknown, empty or invalid values are dropped."""
+    filters = {}
+    q = ' '.join((params.get('q') or '').split())
+    if q:
+        filters['q'] = q
+    category_id = params.get('category_id')
+    if category_id and str(category_id).isdigit():
+        filters['category_id'] = int(category_id)
+    category = (params.get('category') or '').strip()
+    if category:
+        filters['category'] = category
+    for key in ('min_price', 'max_price'):
+        price = _price(params.get(key))
+        if price is not None:
+            filters[key] = str(price)
+    ordering = (params.get('ordering') or '').lower()
+    if ordering in PRODUCT_ORDERINGS:
+        filters['ordering'] = ordering
+    return filters
+
+
+def filter_products(qs, filters: dict, skip=(), rank=True, category_ids=None):
+    """Apply normalized ``filters`` to a Product queryset.
+
+    ``skip`` leaves out filter groups ('category', 'price'), which facets use to
+    count the alternatives to the current selection. ``category_ids`` passes in
+    the ids the ``category`` name resolves to (async callers look them up first).
+
+    ``category_id`` covers the category and all its descendants; ``category``
+    (a name) matches products filed directly under a category of that name only.
+    """
+    if 'q' in filters:
+        qs = search_products(qs, filters['q'], rank=rank)
+    if 'category' not in skip:
+        if 'category_id' in filters:
+            # The category and everything below it
+            qs = qs.filter(category_fk_id__in=category_subtree(filters['category_id']))
+        if 'category' in filters:
+            # Names resolve through the cached name map to an indexed IN on category_fk_id;
+            # until the backfill has run, unlinked products still match on their legacy string
+            if category_ids is None:
+                category_ids = category_ids_for_name(filters['category'])
+            match = Q(category_fk_id__in=category_ids)
+            if settings.PRODUCT_CATEGORY_LEGACY_MATCH:
+                match |= Q(category_fk__isnull=True, category__iexact=filters['category'])
+            qs = qs.filter(match)
+    if 'price' not in skip:
+        if 'min_price' in filters:
+            qs = qs.filter(price__gte=filters['min_price'])
+        if 'max_price' in filters:
+            qs = qs.filter(price__lte=filters['max_price'])
+    ordering = filters.get('ordering')
+    if ordering:
+        qs = qs.order_by(*PRODUCT_ORDERINGS[ordering])
+    elif rank and 'search_rank' in qs.query.annotations:
+        qs = qs.order_by('-search_rank', 'id')
+    return qs
@@ -0,0 +1,142 @@
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+# Responsive variants generated for every uploaded Product.image. Each size is
+# written as JPEG and WebP under a name derived from the original file name.
+IMAGE_VARIANTS = (
+    ('thumb', 160),
+    ('card', 480),
+    ('detail', 1200),
+)
+VARIANT_DIR = 'products/variants'
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def variant_name(source_name: str, variant: str, ext: str) -> str:
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha1(source_name.encode('utf-8')).hexdigest()[:8]
+    return f"{VARIANT_DIR}/{stem}-{digest}-{variant}.{ext}"
+
+
+def _save(storage, name: str, data: bytes) -> str:
+    # Overwrite in place so names stay deterministic
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def _encode(img, fmt: str, **options) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def generate_variants(source_name: str, storage=None) -> dict:
+    """Resize and re-encode ``source_name`` into every variant; returns the map stored on Product.
+
+    The result looks like ``{'source': name, 'thumb': {'width': 160, 'height': 120,
+    'jpg': name, 'webp': name}, ...}``. Images are never upscaled.
+    """
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    with storage.open(source_name, 'rb') as fh:
+        original = Image.open(fh)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    has_alpha = original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info)
+    base = original.convert('RGBA' if has_alpha else 'RGB')
+
+    result = {'source': source_name}
+    for variant, width in IMAGE_VARIANTS:
+        img = base.copy()
+        img.thumbnail((width, width), Image.LANCZOS)
+        if has_alpha:
+            # JPEG has no alpha channel: flatten onto white
+            flat = Image.new('RGB', img.size, (255, 255, 255))
+            flat.paste(img, mask=img.getchannel('A'))
+        else:
+            flat = img
+        result[variant] = {
+            'width': img.width,
+            'height': img.height,
+            'jpg': _save(storage, variant_name(source_name, variant, 'jpg'),
+                         _encode(flat, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)),
+            'webp': _save(storage, variant_name(source_name, variant, 'webp'),
+                          _encode(img, 'WEBP', quality=WEBP_QUALITY, method=4)),
+        }
+    return result
+
+
+def failed_variants(source_name: str) -> dict:
+    # Remembered per source so an unreadable upload is not re-decoded on every save
+    return {'source': source_name, 'error': True}
+
+
+def delete_variants(variants: dict, storage=None):
+    """Remove the files of a variant map that is no longer referenced."""
+    from .models import Product
+
+    source = (variants or {}).get('source')
+    # Variant names derive from the source name, which other products may still use
+    if not source or Product.objects.filter(image=source).exists():
+        return
+    storage = storage or default_storage
+    for variant, _ in IMAGE_VARIANTS:
+        info = (variants or {}).get(variant) or {}
+        for ext in ('jpg', 'webp'):
+            if info.get(ext):
+                storage.delete(info[ext])
+
+
+def variant_urls(variants: dict, storage=None) -> dict | None:
+    """API representation: per-variant URLs plus ready-made ``srcset`` strings."""
+    if not variants or not variants.get('source') or variants.get('error'):
+        return None
+    storage = storage or default_storage
+    data = {}
+    srcset, srcset_webp = [], []
+    for variant, _ in IMAGE_VARIANTS:
+        info = variants.get(variant)
+        if not info:
+            continue
+        jpg, webp = storage.url(info['jpg']), storage.url(info['webp'])
+        data[variant] = {'width': info['width'], 'height': info['height'], 'url': jpg, 'webp': webp}
+        srcset.append(f"{jpg} {info['width']}w")
+        srcset_webp.append(f"{webp} {info['width']}w")
+    data['srcset'] = ', '.join(srcset)
+    data['srcset_webp'] = ', '.join(srcset_webp)
+    return data
+
+
+def refresh_product_variants(product) -> dict:
+    """Regenerate variants when the uploaded image changed; clears them when it was removed.
+
+    A source that cannot be decoded is recorded as failed and not retried until the
+    image changes again. The previous variant files are deleted once the new map commits.
+    """
+    from .models import Product
+
+    source = product.image.name if product.image else ''
+    current = product.image_variants or {}
+    if current.get('source', '') == source:
+        return current
+    variants = {}
+    if source:
+        try:
+            variants = generate_variants(source)
+        except Exception:
+            # Unreadable upload: keep serving the original
+            variants = failed_variants(source)
+    Product.objects.filter(pk=product.pk).update(image_variants=variants)
+    product.image_variants = variants
+    if current:
+        transaction.on_commit(lambda: delete_variants(current))
+    return variants
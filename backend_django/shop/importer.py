@@ -0,0 +1,185 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from .models import Category, Product
+
+# Columns understood by the importer; anything else in the file is ignored.
+# `category` is a path such as "Clothing/Men/Shirts".
+IMPORT_FIELDS = ('external_ref', 'name', 'description', 'price', 'category', 'image_url',
+                 'stock_qty', 'in_stock', 'popularity', 'trend_score')
+CATEGORY_SEPARATOR = '/'
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(fh, fmt):
+    """Yield dicts from an open text file one at a time; ``fmt`` is ``'csv'`` or ``'jsonl'``."""
+    if fmt == 'csv':
+        yield from csv.DictReader(fh)
+        return
+    for lineno, line in enumerate(fh, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            # Keep the row count aligned with checkpoints; the importer reports it
+            row = {'__error__': f"line {lineno}: invalid JSON ({exc})"}
+        yield row if isinstance(row, dict) else {'__error__': f"line {lineno}: expected an object"}
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+# PositiveIntegerField's upper bound on every backend Django supports
+MAX_INT = 2147483647
+
+
+def _int(value, field):
+    try:
+        number = int(str(value).strip() or 0)
+    except ValueError:
+        raise RowError(f"{field}: not an integer: {value!r}")
+    if number < 0:
+        raise RowError(f"{field}: must not be negative")
+    if number > MAX_INT:
+        raise RowError(f"{field}: too large")
+    return number
+
+
+def _price(value):
+    try:
+        price = Decimal(str(value).strip())
+    except InvalidOperation:
+        price = None
+    if price is None or not price.is_finite():
+        raise RowError(f"price: not a number: {value!r}")
+    if price < 0:
+        raise RowError("price: must not be negative")
+    field = Product._meta.get_field('price')
+    # Digits left of the point must fit max_digits - decimal_places, also after rounding
+    limit = field.max_digits - field.decimal_places
+    if price.adjusted() < limit:
+        price = price.quantize(Decimal('0.01'))
+    if price.adjusted() >= limit:
+        raise RowError(f"price: too large: {value!r}")
+    return price
+
+
+def clean_row(row):
+    """Validate and convert one raw row into Product field values (only the columns present)."""
+    if row.get('__error__'):
+        raise RowError(row['__error__'])
+    ref = str(row.get('external_ref') or '').strip()
+    if not ref:
+        raise RowError("external_ref is required")
+    values = {'external_ref': ref}
+    for field in IMPORT_FIELDS[1:]:
+        if field not in row or row[field] is None:
+            continue
+        value = row[field]
+        if field == 'price':
+            value = _price(value)
+        elif field in ('stock_qty', 'popularity', 'trend_score'):
+            value = _int(value, field)
+        elif field == 'in_stock':
+            value = _bool(value)
+        else:
+            value = str(value).strip()
+        values[field] = value
+    return values
+
+
+class CategoryResolver:
+    """Map category path strings to ids, creating missing levels; one query to warm up."""
+
+    def __init__(self, separator=CATEGORY_SEPARATOR):
+        self.separator = separator
+        self.created = 0
+        self._ids = {(parent_id, name): pk for pk, name, parent_id in Category.objects.values_list('id', 'name', 'parent_id')}
+        self._paths = {}
+
+    def resolve(self, path):
+        """Return ``(category_id, leaf_name)`` for ``path`` or ``(None, '')`` for an empty path."""
+        parts = [p.strip() for p in (path or '').split(self.separator) if p.strip()]
+        if not parts:
+            return None, ''
+        key = tuple(parts)
+        if key in self._paths:
+            return self._paths[key], parts[-1]
+        parent_id = None
+        for name in parts:
+            pk = self._ids.get((parent_id, name))
+            if pk is None:
+                category, created = Category.objects.get_or_create(name=name, parent_id=parent_id)
+                pk = self._ids[(parent_id, name)] = category.pk
+                self.created += created
+            parent_id = pk
+        self._paths[key] = parent_id
+        return parent_id, parts[-1]
+
+
+def upsert_products(rows, resolver):
+    """Create or update a chunk of cleaned rows keyed on ``external_ref``.
+
+    Returns ``(created, updated, errors)``. Existing products only get the
+    columns the row actually provides; the last row wins when a chunk repeats a
+    reference. New products without a name or price are skipped and reported.
+    The chunk is written in one transaction; if the database rejects it, the
+    rows are retried one by one and only the failing ones are reported.
+    """
+    by_ref = {}
+    for values in rows:
+        by_ref.setdefault(values['external_ref'], {}).update(values)
+    # Categories are resolved (and created) before the product writes, so a
+    # rolled back chunk never leaves the resolver holding ids that do not exist
+    for values in by_ref.values():
+        if 'category' in values:
+            values['category_fk_id'], values['category'] = resolver.resolve(values['category'])
+    try:
+        return _write_products(by_ref)
+    except DatabaseError:
+        created = updated = 0
+        errors = []
+        for ref, values in by_ref.items():
+            try:
+                c, u, e = _write_products({ref: values})
+            except DatabaseError as exc:
+                errors.append(f"{ref}: rejected by the database ({exc})")
+                continue
+            created, updated = created + c, updated + u
+            errors.extend(e)
+        return created, updated, errors
+
+
+def _write_products(by_ref):
+    with transaction.atomic():
+        existing = Product.objects.in_bulk(list(by_ref), field_name='external_ref')
+        to_create, to_update, fields, errors = [], [], set(), []
+        for ref, values in by_ref.items():
+            product = existing.get(ref)
+            if product is None:
+                if 'price' not in values or not values.get('name'):
+                    errors.append(f"{ref}: new products need name and price")
+                    continue
+                to_create.append(Product(**values))
+                continue
+            for field, value in values.items():
+                setattr(product, field, value)
+            fields.update(values)
+            to_update.append(product)
+        if to_create:
+            Product.objects.bulk_create(to_create)
+        fields.discard('external_ref')
+        if to_update and fields:
+            Product.objects.bulk_update(to_update, sorted(fields))
+    return len(to_create), len(to_update), errors
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .cache import invalidate, invalidate_product_lists, product_version_name
+from .models import Product
+
+
+class _Shortfall(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    def __init__(self, available):
+        # {product_id: units still available} for every line that cannot be filled
+        self.available = available
+        super().__init__(f"Insufficient stock for product(s) {sorted(available)}")
+
+
+def reserve_stock(quantities):
+    """Atomically take ``{product_id: qty}`` out of stock with one conditional UPDATE.
+
+    ``stock_qty = stock_qty - qty WHERE stock_qty >= qty`` is evaluated by the
+    database per row, so concurrent checkouts can never oversell. If any product
+    cannot be filled, nothing is decremented and ``InsufficientStock`` is raised.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return
+    need = Case(*[When(id=pid, then=Value(qty)) for pid, qty in quantities.items()], output_field=IntegerField())
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(id__in=list(quantities), in_stock=True, stock_qty__gte=need).update(
+                stock_qty=F('stock_qty') - need
+            )
+            if updated != len(quantities):
+                raise _Shortfall()
+    except _Shortfall:
+        # Savepoint rolled back: these are the pre-checkout stock levels
+        rows = Product.objects.filter(id__in=list(quantities)).values_list('id', 'in_stock', 'stock_qty')
+        available = {pid: (stock if in_stock else 0) for pid, in_stock, stock in rows}
+        raise InsufficientStock({
+            pid: available.get(pid, 0) for pid, qty in quantities.items()
+            if available.get(pid, 0) < qty
+        })
+    sold_out = Product.objects.filter(id__in=list(quantities), stock_qty=0, in_stock=True).update(in_stock=False)
+    # queryset.update sends no signals. Stock shows on the touched products' own
+    # payloads; availability also on listings and home cards, so only a product
+    # selling out moves the catalogue-wide counters.
+    invalidate(*(product_version_name(pid) for pid in quantities))
+    if sold_out:
+        invalidate('product', 'home')
+    invalidate_product_lists(quantities)
@@ -0,0 +1,217 @@
+import heapq
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Carousel, CarouselCategorySource, CarouselSlide, Category, Product, category_subtree_range
+
+# Orderings for home sections whose products do not depend on a category
+SECTION_ORDERINGS = {
+    'newest': ('-id',),
+    'popular': ('-popularity', '-id'),
+    'trend': ('-trend_score', '-id'),
+}
+
+# Orderings offered by CarouselCategorySource
+SOURCE_ORDERINGS = {
+    **SECTION_ORDERINGS,
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+}
+
+
+def top_products_by_category(category_ids, ordering, limit):
+    """Top ``limit`` products of every category in ``category_ids``, in one windowed query.
+
+    Returns ``{category_id: [Product, ...]}`` preserving ``ordering`` within each category.
+    """
+    result = {cid: [] for cid in category_ids}
+    if not category_ids or limit <= 0:
+        return result
+    for p in ranked_by_category(category_ids, ordering, limit):
+        result[p.category_fk_id].append(p)
+    return result
+
+
+def ranked_by_category(category_ids, ordering, limit):
+    return (
+        Product.objects.filter(category_fk_id__in=list(category_ids))
+        .select_related('style_template')
+        .annotate(row_number=Window(RowNumber(), partition_by=[F('category_fk_id')], order_by=list(ordering)))
+        .filter(row_number__lte=limit)
+        .order_by('category_fk_id', 'row_number')
+    )
+
+
+def category_subtrees(category_ids):
+    """``{category_id: [ids of it and all its descendants]}`` from one query on the path column."""
+    wanted = set(category_ids)
+    result = {cid: [] for cid in wanted}
+    if not wanted:
+        return result
+    match = reduce(or_, (Q(**category_subtree_range(cid)) for cid in wanted))
+    for pk, path in Category.objects.filter(match).values_list('id', 'path'):
+        for part in path.strip('/').split('/'):
+            if part.isdigit() and int(part) in wanted:
+                result[int(part)].append(pk)
+    return result
+
+
+def _ordering_key(ordering):
+    # Every ordering field is numeric, so descending keys can be negated
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    return lambda p: tuple(-getattr(p, name) if desc else getattr(p, name) for name, desc in fields)
+
+
+def top_products_by_subtree(category_ids, ordering, limit):
+    """Like ``top_products_by_category`` but each category also covers its descendants.
+
+    The windowed query ranks products per leaf category as before; every
+    requested category then merges the already sorted top-``limit`` lists of
+    its subtree, so nested categories cost no extra queries.
+    """
+    subtrees = category_subtrees(category_ids)
+    leaves = set().union(*subtrees.values())
+    per_category = top_products_by_category(leaves, ordering, limit)
+    key = _ordering_key(ordering)
+    return {
+        cid: list(heapq.merge(*(per_category[leaf] for leaf in subtree), key=key))[:limit]
+        for cid, subtree in subtrees.items()
+    }
+
+
+def top_products(ordering, limit):
+    if limit <= 0:
+        return []
+    return list(Product.objects.select_related('style_template').order_by(*ordering)[:limit])
+
+
+def load_section_products(sections):
+    """Products for every HomeSection in a constant number of queries.
+
+    One path query and one windowed query cover all category sections (each
+    including its subcategories), plus one ``LIMIT`` query per
+    global kind in use. Products shared between sections are the same instances.
+    Returns ``{section_id: [Product, ...]}``.
+    """
+    by_category = {}
+    by_kind = {}
+    for s in sections:
+        if s.kind == 'category' and s.category_id:
+            by_category[s.category_id] = max(by_category.get(s.category_id, 0), s.limit)
+        else:
+            kind = s.kind if s.kind in SECTION_ORDERINGS else 'newest'
+            by_kind[kind] = max(by_kind.get(kind, 0), s.limit)
+
+    shared = {}
+
+    def _share(products):
+        return [shared.setdefault(p.id, p) for p in products]
+
+    category_products = {}
+    if by_category:
+        fetched = top_products_by_subtree(by_category.keys(), SECTION_ORDERINGS['newest'], max(by_category.values()))
+        category_products = {cid: _share(items) for cid, items in fetched.items()}
+    kind_products = {kind: _share(top_products(SECTION_ORDERINGS[kind], limit)) for kind, limit in by_kind.items()}
+
+    result = {}
+    for s in sections:
+        if s.kind == 'category' and s.category_id:
+            items = category_products.get(s.category_id, [])
+        else:
+            items = kind_products.get(s.kind if s.kind in SECTION_ORDERINGS else 'newest', [])
+        result[s.id] = items[: s.limit]
+    return result
+
+
+def _image_url(p: Product) -> str:
+    try:
+        return p.image.url if p.image else (p.image_url or '')
+    except Exception:
+        return p.image_url or ''
+
+
+def materialize_carousels(carousel_ids):
+    """Carousels with their complete slide lists, loaded in batched queries.
+
+    One query each for carousels, manual slides and category sources, plus a
+    path query and a windowed product query per source ordering in use; a
+    source category includes its subcategories. Returns
+    ``{carousel_id: (Carousel, slides)}`` where ``slides`` lists manual slides
+    first, then the slides generated from category sources.
+    """
+    from .serializers import CarouselSlideSerializer
+
+    ids = list(dict.fromkeys(carousel_ids))
+    if not ids:
+        return {}
+    carousels = Carousel.objects.in_bulk(ids)
+    manual = {cid: [] for cid in carousels}
+    for slide in CarouselSlide.objects.filter(carousel_id__in=ids).order_by('carousel_id', 'order', 'id'):
+        manual[slide.carousel_id].append(slide)
+    sources = list(CarouselCategorySource.objects.filter(carousel_id__in=ids).order_by('order', 'id'))
+
+    wanted = {}
+    for src in sources:
+        ordering = src.ordering if src.ordering in SOURCE_ORDERINGS else 'newest'
+        limits = wanted.setdefault(ordering, {})
+        limits[src.category_id] = max(limits.get(src.category_id, 0), src.limit)
+    products = {
+        ordering: top_products_by_subtree(limits.keys(), SOURCE_ORDERINGS[ordering], max(limits.values()))
+        for ordering, limits in wanted.items()
+    }
+
+    generated = {cid: [] for cid in carousels}
+    for src in sources:
+        if src.carousel_id not in generated:
+            continue
+        ordering = src.ordering if src.ordering in SOURCE_ORDERINGS else 'newest'
+        for p in products[ordering].get(src.category_id, [])[: src.limit]:
+            generated[src.carousel_id].append({
+                'id': p.id,
+                'title': p.name,
+                'image_url': _image_url(p),
+                'link_url': f"/product/{p.id}",
+                'order': 0,
+            })
+
+    return {
+        cid: (carousel, list(CarouselSlideSerializer(manual[cid], many=True).data) + generated[cid])
+        for cid, carousel in carousels.items()
+    }
+
+
+def build_category_tree(with_counts=False):
+    """Nested category tree (roots and children sorted by name) from one flat query.
+
+    With ``with_counts`` every node gets ``product_count`` including its descendants,
+    computed from a single grouped count over products.
+    """
+    nodes = {}
+    rows = Category.objects.order_by('name', 'id').values_list('id', 'name', 'parent_id')
+    for cid, name, parent_id in rows:
+        nodes[cid] = {'id': cid, 'name': name, 'parent': parent_id, 'children': []}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent'])
+        if parent is None:
+            roots.append(node)
+        else:
+            parent['children'].append(node)
+
+    if with_counts:
+        direct = dict(
+            Product.objects.filter(category_fk__isnull=False)
+            .values_list('category_fk_id')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        # Breadth-first order, then roll counts up from the deepest nodes
+        order = list(roots)
+        for node in order:
+            order.extend(node['children'])
+        for node in reversed(order):
+            node['product_count'] = direct.get(node['id'], 0) + sum(c['product_count'] for c in node['children'])
+    return roots
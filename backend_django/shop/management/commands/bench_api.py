@@ -0,0 +1,222 @@
+import json
+import time
+from itertools import count
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+
+from shop.benchmarks import benchmark_database, generate_catalogue, percentile
+
+API_PREFIX = "/api/"
+
+
+def _route_names(patterns, prefix=""):
+    """Every endpoint in shop/urls.py, keyed like ``_route_key`` (format suffix variants skipped)."""
+    names = set()
+    for p in patterns:
+        if isinstance(p, URLResolver):
+            names |= _route_names(p.url_patterns, prefix + str(p.pattern))
+        elif isinstance(p, URLPattern):
+            if "format" in str(p.pattern):
+                continue
+            names.add(p.name or prefix + str(p.pattern))
+    return names
+
+
+def _route_key(path):
+    match = resolve("/" + path.split("?", 1)[0], urlconf="shop.urls")
+    return match.url_name or match.route
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic catalogue in a throwaway database and measure latency and query counts for every API route."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--categories", type=int, default=200)
+        parser.add_argument("--depth", type=int, default=4, help="Category tree depth")
+        parser.add_argument("--orders", type=int, default=1000)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--sections", type=int, default=8, help="Home sections")
+        parser.add_argument("--carousels", type=int, default=3)
+        parser.add_argument("--iterations", type=int, default=30, help="Measured requests per endpoint")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests per endpoint")
+        parser.add_argument("--only", default="", help="Comma-separated endpoint names to run")
+        parser.add_argument("--output", default="", help="Write results as JSON to this path")
+        parser.add_argument("--compare", default="", help="Baseline JSON from a previous --output to diff against")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as fh:
+                    baseline = json.load(fh).get("endpoints", {})
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        with benchmark_database():
+            started = time.perf_counter()
+            ctx = generate_catalogue(
+                products=options["products"], categories=options["categories"], depth=options["depth"],
+                sections=options["sections"], carousels=options["carousels"], orders=options["orders"],
+                lines_per_order=options["items_per_order"],
+                log=lambda msg: self.stdout.write(f"  {msg}") if options["verbosity"] > 1 else None,
+            )
+            self.stdout.write(f"Generated catalogue in {time.perf_counter() - started:.1f}s")
+
+            anon = Client(raise_request_exception=False)
+            member = Client(raise_request_exception=False)
+            member.force_login(ctx["user"])
+            staff = Client(raise_request_exception=False)
+            staff.force_login(User.objects.create_superuser("bench-admin", "bench-admin@example.com", "bench-password"))
+            specs = self._specs(ctx, anon, member, staff)
+            if options["only"]:
+                wanted = {name.strip() for name in options["only"].split(",") if name.strip()}
+                specs = [s for s in specs if s[0] in wanted]
+
+            covered = {_route_key(s[3](0) if callable(s[3]) else s[3]) for s in specs}
+            missing = sorted(_route_names(self._urlpatterns()) - covered)
+            if missing and not options["only"]:
+                self.stdout.write(self.style.WARNING(f"Routes without a benchmark: {', '.join(missing)}"))
+
+            results = {}
+            for name, client, method, path, body in specs:
+                results[name] = self._measure(client, method, path, body, options["iterations"], options["warmup"])
+
+        self._report(results, baseline)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump({"meta": {k: options[k] for k in (
+                    "products", "categories", "depth", "orders", "items_per_order", "sections", "carousels",
+                    "iterations", "warmup",
+                )} | {"database": connection.vendor}, "endpoints": results}, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def _urlpatterns(self):
+        from shop.urls import urlpatterns
+        return urlpatterns
+
+    def _specs(self, ctx, anon, member, staff):
+        """(name, client, method, path, body) for every route; paths and bodies may be callables of the run number."""
+        products, categories = ctx["product_ids"], ctx["category_ids"]
+        roots, orders = ctx["root_category_ids"], ctx["order_ids"]
+        n = count()
+        unique = lambda: next(n)  # noqa: E731
+
+        def pick(values):
+            return lambda i: values[i % len(values)]
+
+        def order_body(i):
+            pid = products[i % len(products)]
+            return {"customer_name": "Bench", "customer_email": "bench@example.com",
+                    "items": [{"product": pid, "quantity": 1, "price": "1.00"}]}
+
+        def register_body(i):
+            k = unique()
+            return {"email": f"register{k}@example.com", "password": "bench-password"}
+
+        login = {"username": "bench", "password": "bench-password"}
+        return [
+            ("api_root", anon, "get", "", None),
+            ("home", anon, "get", "home/", None),
+            ("products.list", anon, "get", "products/", None),
+            ("products.list_card", anon, "get", "products/?view=card", None),
+            ("products.list_popular", anon, "get", "products/?ordering=popular", None),
+            ("products.search", anon, "get", f"products/?q={ctx['search_word']}", None),
+            # "walk" follows every next link, so a cursor that cannot be read back shows up as a 404
+            ("products.search_pages", anon, "walk", f"products/?q={ctx['search_word']}&page_size=100", None),
+            ("products.category", anon, "get", lambda i: f"products/?category_id={pick(roots)(i)}", None),
+            ("products.price_range", anon, "get", "products/?min_price=10&max_price=200", None),
+            ("products.facets", anon, "get", "products/facets/", None),
+            ("products.detail", anon, "get", lambda i: f"products/{pick(products)(i)}/", None),
+            ("products.clone", member, "post", lambda i: f"products/{pick(products)(i)}/clone/", {}),
+            ("categories.list", anon, "get", "categories/", None),
+            ("categories.tree", anon, "get", "categories/tree/?counts=1", None),
+            ("categories.detail", anon, "get", lambda i: f"categories/{pick(categories)(i)}/", None),
+            ("orders.list", member, "get", "orders/", None),
+            ("orders.all", staff, "get", "orders/", None),
+            ("orders.by_email", anon, "get", f"orders/?email={ctx['customer_email']}", None),
+            ("orders.detail", staff, "get", lambda i: f"orders/{pick(orders)(i)}/", None),
+            ("orders.create", anon, "post", "orders/", order_body),
+            ("orders.export", staff, "get", "orders/export/", None),
+            ("auth.register", anon, "post", "auth/register/", register_body),
+            ("auth.login", Client(raise_request_exception=False), "post", "auth/login/", login),
+            ("auth.me", member, "get", "auth/me/", None),
+            ("auth.logout", Client(raise_request_exception=False), "post", "auth/logout/", {}),
+            ("auth.csrf", anon, "get", "auth/csrf/", None),
+            ("auth.bootstrap_superuser", anon, "post", "auth/bootstrap-superuser/", {}),
+            ("payment.settings", anon, "get", "payment/settings/", None),
+            ("payment.gateways", anon, "get", "payment/gateways/", None),
+            ("metrics", anon, "get", "_metrics", None),
+            ("async.home", anon, "get", "async/home/", None),
+            ("async.products.list", anon, "get", "async/products/", None),
+            ("async.products.search_pages", anon, "walk", f"async/products/?q={ctx['search_word']}&page_size=100", None),
+            ("async.products.detail", anon, "get", lambda i: f"async/products/{pick(products)(i)}/", None),
+            ("async.categories.tree", anon, "get", "async/categories/tree/?counts=1", None),
+            ("async.payment.settings", anon, "get", "async/payment/settings/", None),
+            ("async.payment.gateways", anon, "get", "async/payment/gateways/", None),
+        ]
+
+    def _measure(self, client, method, path, body, iterations, warmup):
+        timings, queries, sizes, statuses = [], [], [], {}
+        for i in range(warmup + iterations):
+            url = API_PREFIX + (path(i) if callable(path) else path)
+            data = body(i) if callable(body) else body
+            kwargs = {"content_type": "application/json", "data": json.dumps(data)} if method == "post" else {}
+            with CaptureQueriesContext(connection) as captured:
+                t0 = time.perf_counter()
+                if method == "walk":
+                    resp, content = self._walk(client, url)
+                else:
+                    resp = getattr(client, method)(url, **kwargs)
+                    # Streaming bodies are produced lazily: consume them inside the measurement
+                    content = b"".join(resp.streaming_content) if resp.streaming else resp.content
+                elapsed = time.perf_counter() - t0
+            if i < warmup:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(len(captured.captured_queries))
+            sizes.append(len(content))
+            statuses[str(resp.status_code)] = statuses.get(str(resp.status_code), 0) + 1
+        return {
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "queries": max(queries) if queries else 0,
+            "bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+            "status": statuses,
+        }
+
+    def _walk(self, client, url):
+        """GET ``url`` and every ``next`` page after it; stops at the first non-200 response."""
+        content, seen = b"", set()
+        while url:
+            resp = client.get(url)
+            content += resp.content
+            if resp.status_code != 200:
+                break
+            page = resp.json()
+            ids = [row["id"] for row in page["results"]]
+            if seen.intersection(ids):
+                raise CommandError(f"{url} repeated rows from an earlier page")
+            seen.update(ids)
+            url = page["next"]
+        return resp, content
+
+    def _report(self, results, baseline):
+        header = f"{'endpoint':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'bytes':>10}  status"
+        if baseline is not None:
+            header += "    Δp95      Δqueries"
+        self.stdout.write(header)
+        for name, r in results.items():
+            status_text = ",".join(f"{code}×{n}" for code, n in sorted(r["status"].items()))
+            line = f"{name:<28}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['queries']:>9}{r['bytes']:>10}  {status_text}"
+            old = (baseline or {}).get(name)
+            if old:
+                dp95 = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0
+                line += f"    {dp95:+6.1f}%   {r['queries'] - old['queries']:+d}"
+            self.stdout.write(line)
@@ -0,0 +1,83 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shop.benchmarks import benchmark_database
+
+
+class Command(BaseCommand):
+    help = "Race many concurrent buyers for the last units of a product and verify nothing is oversold."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=32, help="Concurrent buyers")
+        parser.add_argument("--stock", type=int, default=5, help="Units available before the race")
+        parser.add_argument("--quantity", type=int, default=1, help="Units each buyer tries to buy")
+
+    def handle(self, *args, **options):
+        from rest_framework.exceptions import ValidationError
+        from shop.models import OrderItem, Product
+        from shop.serializers import OrderSerializer
+
+        buyers, stock, quantity = options["buyers"], options["stock"], options["quantity"]
+        with benchmark_database():
+            product = Product.objects.create(name="Last units", price=Decimal("10.00"), stock_qty=stock)
+            connection.close()
+            results = {"sold": 0, "rejected": 0, "errors": []}
+            lock = threading.Lock()
+            barrier = threading.Barrier(buyers)
+
+            def buyer():
+                try:
+                    barrier.wait()
+                    s = OrderSerializer(data={
+                        "customer_name": "Buyer",
+                        "items": [{"product": product.id, "quantity": quantity, "price": "10.00"}],
+                    })
+                    s.is_valid(raise_exception=True)
+                    # SQLite serializes writers; retry lock timeouts like a client would
+                    for attempt in range(20):
+                        try:
+                            s.save()
+                            break
+                        except ValidationError:
+                            raise
+                        except Exception as exc:
+                            if "locked" not in str(exc) or attempt == 19:
+                                raise
+                            time.sleep(0.05)
+                    with lock:
+                        results["sold"] += 1
+                except ValidationError:
+                    with lock:
+                        results["rejected"] += 1
+                except Exception as exc:
+                    with lock:
+                        results["errors"].append(exc)
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=buyer) for _ in range(buyers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            product.refresh_from_db()
+            units_sold = sum(OrderItem.objects.filter(product=product).values_list("quantity", flat=True))
+            self.stdout.write(
+                f"buyers={buyers} stock={stock} qty/buyer={quantity}: orders={results['sold']} "
+                f"rejected={results['rejected']} errors={len(results['errors'])} units_sold={units_sold} "
+                f"stock_left={product.stock_qty} in_stock={product.in_stock}"
+            )
+            if results["errors"]:
+                self.stdout.write(self.style.WARNING(f"first error: {results['errors'][0]!r}"))
+            oversold = units_sold > stock or units_sold + product.stock_qty != stock
+            expected = min(buyers, stock // quantity) * quantity
+            if oversold:
+                raise CommandError("Oversold: inventory does not add up.")
+            if not results["errors"] and units_sold != expected:
+                raise CommandError(f"Undersold: expected {expected} units sold, got {units_sold}.")
+            self.stdout.write(self.style.SUCCESS("No oversell."))
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shop.benchmarks import benchmark_database, generate_catalogue, percentile
+
+# Hot read endpoints: (name, sync path, async path); {pid} is a product id
+ENDPOINTS = (
+    ("home", "home/", "async/home/"),
+    ("products.list", "products/", "async/products/"),
+    ("products.detail", "products/{pid}/", "async/products/{pid}/"),
+    ("categories.tree", "categories/tree/", "async/categories/tree/"),
+    ("payment.settings", "payment/settings/", "async/payment/settings/"),
+    ("payment.gateways", "payment/gateways/", "async/payment/gateways/"),
+)
+
+# mode -> (server command, use the async paths)
+SERVERS = {
+    "wsgi": (["gunicorn", "backend_django.wsgi:application", "--workers", "{workers}", "--bind", "127.0.0.1:{port}"], False),
+    "asgi": (["uvicorn", "backend_django.asgi:application", "--workers", "{workers}", "--port", "{port}", "--no-access-log"], True),
+}
+
+
+async def _request(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get("connection", "").lower() != "close"
+
+
+async def _load(base_url, paths, concurrency, duration):
+    """``concurrency`` keep-alive clients hammering ``paths`` round-robin for ``duration`` seconds."""
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    prefix = url.path.rstrip("/") + "/"
+    latencies, errors = [], [0]
+    deadline = time.perf_counter() + duration
+
+    async def client(n):
+        conn = None
+        i = n
+        while time.perf_counter() < deadline:
+            path = prefix + paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = await asyncio.open_connection(host, port)
+                status, keep = await _request(*conn, f"{host}:{port}", path)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                errors[0] += 1
+                if conn:
+                    conn[1].close()
+                conn = None
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors[0] += 1
+            if not keep:
+                conn[1].close()
+                conn = None
+        if conn:
+            conn[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "errors": errors[0],
+    }
+
+
+def _wait_for(port, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise CommandError(f"Server exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not start listening on port {port}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and tail latency of the sync views on gunicorn/WSGI against the async "
+        "views on uvicorn/ASGI under many concurrent keep-alive clients, on a synthetic catalogue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=200, help="Concurrent clients")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint and mode")
+        parser.add_argument("--workers", type=int, default=3, help="Server worker processes")
+        parser.add_argument("--modes", default="wsgi,asgi", help=f"Comma-separated: {', '.join(SERVERS)}")
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--url", default="", help="Benchmark an already running server (e.g. http://host:8000/api/) instead")
+        parser.add_argument("--output", default="", help="Write results as JSON to this path")
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+        unknown = [m for m in modes if m not in SERVERS]
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(unknown)}")
+
+        results = {}
+        if options["url"]:
+            for mode in modes:
+                results[mode] = self._run_mode(options["url"], SERVERS[mode][1], [1], options)
+        else:
+            if connection.vendor != "sqlite":
+                raise CommandError("Spawned servers need a SQLite benchmark database; use --url against a running server.")
+            with benchmark_database() as db_name:
+                ctx = generate_catalogue(products=options["products"], orders=0)
+                connection.close()
+                env = dict(os.environ, SQLITE_PATH=str(db_name), CACHE_BACKEND="locmem", DEBUG="0",
+                           ALLOWED_HOSTS="127.0.0.1,localhost", REQUEST_METRICS="0")
+                for mode in modes:
+                    command, use_async = SERVERS[mode]
+                    argv = [a.format(workers=options["workers"], port=options["port"]) for a in command]
+                    self.stdout.write(f"Starting {mode}: {' '.join(argv)}")
+                    proc = subprocess.Popen(argv, cwd=settings.BASE_DIR, env=env,
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                    try:
+                        _wait_for(options["port"], proc)
+                        base = f"http://127.0.0.1:{options['port']}/api/"
+                        results[mode] = self._run_mode(base, use_async, ctx["product_ids"], options)
+                    finally:
+                        proc.terminate()
+                        proc.wait(timeout=30)
+
+        self._report(results, modes)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump({"meta": {k: options[k] for k in ("concurrency", "duration", "workers", "products")},
+                           "results": results}, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def _run_mode(self, base, use_async, product_ids, options):
+        out = {}
+        for name, sync_path, async_path in ENDPOINTS:
+            template = async_path if use_async else sync_path
+            paths = [template.format(pid=pid) for pid in product_ids[:500]] if "{pid}" in template else [template]
+            # Warm caches on every worker before measuring
+            asyncio.run(_load(base, paths, options["workers"] * 4, 1.0))
+            out[name] = asyncio.run(_load(base, paths, options["concurrency"], options["duration"]))
+            r = out[name]
+            self.stdout.write(f"  {name:<20} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:.1f}  p99 {r['p99_ms']:.1f} ms")
+        return out
+
+    def _report(self, results, modes):
+        self.stdout.write(f"{'endpoint':<20}{'mode':>6}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for name, _, _ in ENDPOINTS:
+            for mode in modes:
+                r = results.get(mode, {}).get(name)
+                if r:
+                    self.stdout.write(f"{name:<20}{mode:>6}{r['rps']:>10.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['errors']:>8}")
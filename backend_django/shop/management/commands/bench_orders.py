@@ -0,0 +1,101 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shop.benchmarks import benchmark_database, percentile
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent order creation (orders/second) on a throwaway database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", default="1,4,16", help="Comma-separated concurrent writer counts")
+        parser.add_argument("--orders", type=int, default=200, help="Orders per writer count")
+        parser.add_argument("--lines", type=int, default=3, help="Lines per order")
+        parser.add_argument("--block-size", type=int, default=None, help="Order number block size (1 = one counter update per order)")
+        parser.add_argument("--sqlite-tuning", default="", metavar="on,off",
+                            help="SQLite only: run with the tuned connection options, stock options, or both (default: as configured)")
+
+    def handle(self, *args, **options):
+        from shop.order_numbers import allocator
+
+        writers = [int(w) for w in options["writers"].split(",") if w.strip()]
+        allocator.block_size = options["block_size"]
+        tunings = [t.strip() for t in options["sqlite_tuning"].split(",") if t.strip()]
+        if tunings and connection.vendor != "sqlite":
+            raise CommandError("--sqlite-tuning only applies to SQLite.")
+        if any(t not in ("on", "off") for t in tunings):
+            raise CommandError("--sqlite-tuning takes on, off or on,off.")
+
+        original = connection.settings_dict.get("OPTIONS", {})
+        try:
+            for tuning in tunings or [None]:
+                if tuning is not None:
+                    connection.settings_dict["OPTIONS"] = dict(settings.SQLITE_TUNING_OPTIONS) if tuning == "on" else {}
+                    self.stdout.write(f"SQLite tuning {tuning}")
+                self._run(writers, options)
+        finally:
+            connection.settings_dict["OPTIONS"] = original
+
+    def _run(self, writers, options):
+        from shop.models import Order, Product
+        from shop.order_numbers import allocator
+        from shop.serializers import OrderSerializer
+
+        total_orders = options["orders"]
+
+        with benchmark_database():
+            products = Product.objects.bulk_create(
+                Product(name=f"Bench product {i}", price=Decimal("9.99"), stock_qty=10 ** 6) for i in range(50)
+            )
+            payload_items = [
+                {"product": p.id, "quantity": 1, "price": str(p.price)} for p in products[: options["lines"]]
+            ]
+            connection.close()
+
+            for count in writers:
+                allocator.discard()
+                per_writer = max(1, total_orders // count)
+                latencies, errors = [], []
+                lock = threading.Lock()
+
+                def worker():
+                    try:
+                        for _ in range(per_writer):
+                            start = time.perf_counter()
+                            try:
+                                s = OrderSerializer(data={"customer_name": "Bench", "items": payload_items})
+                                s.is_valid(raise_exception=True)
+                                s.save()
+                            except Exception as exc:
+                                with lock:
+                                    errors.append(exc)
+                                continue
+                            with lock:
+                                latencies.append(time.perf_counter() - start)
+                    finally:
+                        connection.close()
+
+                threads = [threading.Thread(target=worker) for _ in range(count)]
+                started = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                elapsed = time.perf_counter() - started
+
+                numbers = list(Order.objects.values_list("order_number", flat=True))
+                duplicates = len(numbers) - len(set(numbers))
+                self.stdout.write(
+                    f"writers={count:>3}  orders={len(latencies):>5}  errors={len(errors):>4}  "
+                    f"orders/s={len(latencies) / elapsed:8.1f}  "
+                    f"p50={percentile(latencies, 50) * 1000:7.1f}ms  p99={percentile(latencies, 99) * 1000:7.1f}ms  "
+                    f"duplicate_numbers={duplicates}"
+                )
+                if errors:
+                    self.stdout.write(self.style.WARNING(f"  first error: {errors[0]!r}"))
+                connection.close()
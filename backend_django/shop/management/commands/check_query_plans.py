@@ -0,0 +1,143 @@
+import contextlib
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from shop.benchmarks import benchmark_database, generate_catalogue
+
+# Category.path's db_index; the generated name ends in a hash (and "_like" on Postgres)
+CATEGORY_PATH_INDEX = "shop_category_path_"
+
+
+def _shapes(category_ids):
+    """(name, queryset, index or indexes that must be used, whether the index must also provide the order).
+
+    Unordered shapes must look their rows up through the index, ordered ones may
+    also walk it in order.
+    """
+    from shop.filters import filter_products
+    from shop.loaders import SECTION_ORDERINGS, ranked_by_category
+    from shop.models import Category, Order, Product
+
+    cid = category_ids[0]
+    name = Category.objects.filter(pk=cid).values_list("name", flat=True).first() or ""
+    since = timezone.now() - datetime.timedelta(days=30)
+    return [
+        # The product list's own filters: ?category_id= covers the subtree, ?category= a name
+        # Subtrees and names can span several categories, so the page is merged with a sort
+        ("products.category_subtree", filter_products(Product.objects.all(), {"category_id": cid}).order_by("-id")[:25],
+         ("product_category_newest_idx", CATEGORY_PATH_INDEX), False),
+        ("products.category_name", filter_products(Product.objects.all(), {"category": name}).order_by("-id")[:25],
+         "product_category_newest_idx", False),
+        ("home.category_sections", ranked_by_category(category_ids[:5], SECTION_ORDERINGS["newest"], 12),
+         "product_category_newest_idx", False),
+        ("products.popular", filter_products(Product.objects.all(), {"ordering": "popular"})[:25],
+         "product_popular_idx", True),
+        ("products.trend", filter_products(Product.objects.all(), {"ordering": "trend"})[:25],
+         "product_trend_idx", True),
+        ("products.price_asc", filter_products(Product.objects.all(), {"ordering": "price_asc"})[:25],
+         "product_price_idx", True),
+        ("products.price_desc", filter_products(Product.objects.all(), {"ordering": "price_desc"})[:25],
+         "product_price_idx", True),
+        ("products.price_range", filter_products(
+            Product.objects.all(), {"min_price": "10.00", "max_price": "20.00", "ordering": "price_asc"})[:25],
+         "product_price_idx", True),
+        ("orders.by_email", Order.objects.alias(email_lower=Lower("customer_email"))
+         .filter(email_lower=Lower(Value("Someone@Example.com")), user__isnull=True).order_by("-id"),
+         "order_email_lower_idx", False),
+        ("orders.for_user", Order.objects.filter(user_id=1).order_by("-id")[:25], "order_user_recent_idx", True),
+        ("orders.status_since", Order.objects.filter(status="paid", created_at__gte=since).order_by("-id"),
+         "order_status_created_idx", False),
+    ]
+
+
+def _explain(qs):
+    # QuerySet.explain() prefixes the inner query of windowed filters too, so run EXPLAIN directly
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+def _seeks(plan, index, vendor):
+    # Looked up by key, not read end to end (a full index scan also names the index)
+    if vendor == "sqlite":
+        return re.search(rf"SEARCH .*USING (COVERING )?INDEX {index}\S* \(", plan) is not None
+    pattern = rf"(Index (Only )?Scan( Backward)? using|Bitmap Index Scan on) {index}\S*[^\n]*\n\s*(->\s*)?Index Cond"
+    return re.search(pattern, plan) is not None
+
+
+def _sorts(plan, vendor):
+    if vendor == "sqlite":
+        return "USE TEMP B-TREE FOR ORDER BY" in plan
+    return re.search(r"^\s*(->\s*)?(Incremental )?Sort\b", plan, re.MULTILINE) is not None
+
+
+@contextlib.contextmanager
+def _prefer_indexes():
+    # Postgres would rather seq-scan tables this small; ask whether an index
+    # plan exists at all, as it would be chosen at production sizes.
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        yield
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot catalogue and order query shapes and fail unless each one is served by its "
+        "index (and, for ordered listings, takes its order from the index instead of sorting). "
+        "Runs against a throwaway migrated database unless --current is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--current", action="store_true", help="Check the configured database instead")
+        parser.add_argument("--products", type=int, default=2000, help="Products generated for the throwaway database")
+        parser.add_argument("--show-plans", action="store_true")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"Query plans are only checked on SQLite and Postgres, not {connection.vendor}.")
+        if options["current"]:
+            failures = self._check(options)
+        else:
+            with benchmark_database():
+                # No ANALYZE: statistics from a toy catalogue would talk the planner
+                # out of indexes it needs at production sizes
+                generate_catalogue(products=options["products"], orders=200)
+                failures = self._check(options)
+        if failures:
+            raise CommandError(f"{len(failures)} query shape(s) not served by their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All query shapes use their indexes."))
+
+    def _check(self, options):
+        from shop.models import Category
+
+        category_ids = list(Category.objects.order_by("id").values_list("id", flat=True)[:5]) or [0]
+        failures = []
+        with _prefer_indexes():
+            for name, qs, index, ordered in _shapes(category_ids):
+                plan = _explain(qs)
+                indexes = (index,) if isinstance(index, str) else index
+                problems = [f"does not use {name}" for name in indexes if name not in plan]
+                if not ordered:
+                    problems += [
+                        f"reads all of {name} instead of looking rows up"
+                        for name in indexes if name in plan and not _seeks(plan, name, connection.vendor)
+                    ]
+                if ordered and _sorts(plan, connection.vendor):
+                    problems.append("sorts instead of reading in index order")
+                if problems:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FAIL {name}: {'; '.join(problems)}"))
+                else:
+                    self.stdout.write(f"ok   {name} ({', '.join(indexes)})")
+                if problems or options["show_plans"]:
+                    self.stdout.write("     " + plan.replace("\n", "\n     "))
+        return failures
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Incrementally recompute Product.popularity and Product.trend_score from order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Discard the watermark and recompute from scratch")
+        parser.add_argument("--window-days", type=int, default=None, help="Popularity window (default: keep current, initially 90)")
+        parser.add_argument("--half-life-hours", type=int, default=None, help="Trend half-life (default: keep current, initially 168)")
+        parser.add_argument("--loop", type=int, default=0, metavar="SECONDS", help="Keep running, sleeping this long between runs")
+
+    def handle(self, *args, **options):
+        from django.db import close_old_connections
+        from shop.rankings import compute_rankings
+
+        rebuild = options["rebuild"]
+        while True:
+            started = time.perf_counter()
+            stats = compute_rankings(rebuild=rebuild, window_days=options["window_days"], half_life_hours=options["half_life_hours"])
+            rebuild = False
+            self.stdout.write(
+                f"{'Rebuilt' if stats['rebuild'] else 'Updated'} rankings through order {stats['orders_through']}: "
+                f"{stats['new_units']} new unit(s), {stats['expired_units']} expired, {stats['decay_steps']} decay step(s), "
+                f"{stats['products_updated']} product(s) written in {time.perf_counter() - started:.2f}s"
+            )
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["loop"])
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Stream orders with their line items as NDJSON or CSV, filtered by creation date and status."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+        parser.add_argument("--from", dest="from", default="", help="ISO date/datetime, inclusive")
+        parser.add_argument("--to", dest="to", default="", help="ISO date/datetime; a bare date includes that day")
+        parser.add_argument("--status", default="", help="Comma-separated statuses")
+        parser.add_argument("--output", default="-", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Orders fetched per query")
+
+    def handle(self, *args, **options):
+        from shop.exports import export_filters, export_queryset, iter_orders, render_orders
+
+        try:
+            filters = export_filters(options)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        orders = iter_orders(export_queryset(filters), chunk_size=max(1, options["chunk_size"]))
+        out = sys.stdout if options["output"] == "-" else open(options["output"], "w", newline="", encoding="utf-8")
+        count = 0
+        try:
+            for part in render_orders(orders, options["format"]):
+                out.write(part)
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options["output"] != "-":
+            lines = count - (options["format"] == "csv")
+            self.stderr.write(f"Wrote {lines} order(s) to {options['output']}")
@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _generate(pk, source_name):
+    # Runs in a worker process: only touches storage, never the database
+    from shop.images import generate_variants
+    try:
+        return pk, generate_variants(source_name), None
+    except Exception as exc:
+        return pk, None, f"{type(exc).__name__}: {exc}"
+
+
+class Command(BaseCommand):
+    help = "Generate responsive image variants for existing product images using a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+        parser.add_argument("--force", action="store_true",
+                            help="Regenerate variants that are already up to date, and retry images that failed")
+        parser.add_argument("--batch-size", type=int, default=200, help="Rows written back per bulk_update")
+
+    def handle(self, *args, **options):
+        from shop.cache import PRODUCT_LIST_TAG, invalidate
+        from shop.images import delete_variants, failed_variants
+        from shop.models import Product
+
+        todo, stale = [], {}
+        for pk, name, variants in Product.objects.exclude(image='').exclude(image__isnull=True).values_list("id", "image", "image_variants").iterator():
+            if options["force"] or (variants or {}).get("source") != name:
+                todo.append((pk, name))
+                if variants and variants.get("source") != name:
+                    stale[pk] = variants
+        if not todo:
+            self.stdout.write(self.style.SUCCESS("All product images already have variants."))
+            return
+
+        self.stdout.write(f"Generating variants for {len(todo)} image(s) with {options['workers']} worker(s)...")
+        # Children must not inherit the parent's open database connections
+        connections.close_all()
+        started = time.perf_counter()
+        done, failed, pending = 0, 0, []
+        sources = dict(todo)
+
+        def flush():
+            if pending:
+                Product.objects.bulk_update(pending, ["image_variants"])
+                # Files of the previous source are unreferenced once the new maps are saved
+                for product in pending:
+                    delete_variants(stale.pop(product.pk, None))
+                pending.clear()
+
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"]), initializer=_init_worker) as pool:
+            futures = [pool.submit(_generate, pk, name) for pk, name in todo]
+            for future in as_completed(futures):
+                pk, variants, error = future.result()
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"Product {pk}: {error}"))
+                    # Recorded so saves do not retry it; --force tries again
+                    variants = failed_variants(sources[pk])
+                else:
+                    done += 1
+                pending.append(Product(pk=pk, image_variants=variants))
+                if len(pending) >= options["batch_size"]:
+                    flush()
+                    self.stdout.write(f"  {done}/{len(todo)} done")
+        flush()
+        invalidate("product", "home", PRODUCT_LIST_TAG)
+
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} image(s), {failed} failed, in {elapsed:.1f}s ({rate:.1f}/s)."))
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSONL supplier catalogue into Product rows, upserting on external_ref. "
+        "Category paths like 'Clothing/Men/Shirts' are resolved or created. Progress is "
+        "checkpointed after every committed chunk so an interrupted run can --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (with a header row) or JSON Lines file")
+        parser.add_argument("--format", choices=("auto", "csv", "jsonl"), default="auto")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Rows per transaction")
+        parser.add_argument("--separator", default="/", help="Category path separator")
+        parser.add_argument("--checkpoint", default="", help="Checkpoint file (default: <path>.checkpoint)")
+        parser.add_argument("--resume", action="store_true", help="Skip rows already committed by a previous run")
+        parser.add_argument("--max-errors", type=int, default=1000, help="Abort after this many rejected rows")
+
+    def handle(self, *args, **options):
+        from shop.cache import PRODUCT_LIST_TAG, invalidate
+        from shop.importer import CategoryResolver, RowError, clean_row, read_rows, upsert_products
+
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        fmt = options["format"]
+        if fmt == "auto":
+            fmt = "csv" if path.lower().endswith(".csv") else "jsonl"
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+        source = {"path": os.path.abspath(path), "size": os.path.getsize(path)}
+
+        skip = 0
+        if options["resume"] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as fh:
+                state = json.load(fh)
+            if state.get("source") != source:
+                raise CommandError(f"{checkpoint_path} belongs to a different or modified file; remove it to start over.")
+            skip = state["rows"]
+            self.stdout.write(f"Resuming after {skip} row(s)")
+
+        resolver = CategoryResolver(separator=options["separator"])
+        batch_size = max(1, options["batch_size"])
+        done, created, updated, rejected = skip, 0, 0, 0
+        started = time.perf_counter()
+
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            rows = islice(read_rows(fh, fmt), skip, None)
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if not chunk:
+                    break
+                cleaned = []
+                for offset, row in enumerate(chunk):
+                    try:
+                        cleaned.append(clean_row(row))
+                    except RowError as exc:
+                        rejected += 1
+                        self.stdout.write(self.style.WARNING(f"row {done + offset + 1}: {exc}"))
+                c, u, errors = upsert_products(cleaned, resolver)
+                for error in errors:
+                    self.stdout.write(self.style.WARNING(error))
+                created, updated, rejected = created + c, updated + u, rejected + len(errors)
+                done += len(chunk)
+                # Written only after the chunk committed, so --resume never skips uncommitted rows
+                with open(checkpoint_path, "w") as cp:
+                    json.dump({"source": source, "rows": done}, cp)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"  {done} rows ({(done - skip) / elapsed:,.0f} rows/s): {created} created, {updated} updated, {rejected} rejected")
+                if rejected > options["max_errors"]:
+                    raise CommandError(f"Too many rejected rows ({rejected}); fix the file and rerun with --resume.")
+
+        # bulk_create/bulk_update send no signals
+        invalidate("product", "home", PRODUCT_LIST_TAG, *(("category",) if resolver.created else ()))
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.perf_counter() - started
+        rate = (done - skip) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {done - skip} row(s) in {elapsed:.1f}s ({rate:,.0f} rows/s): {created} created, "
+            f"{updated} updated, {rejected} rejected, {resolver.created} categories created."
+        ))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+
+
+class Command(BaseCommand):
+    help = (
+        "One-off backfill reconciling the legacy Product.category strings with category_fk: products "
+        "without a category_fk are linked to the category whose name matches their string, and linked "
+        "products get their string reset to the category's name. Saves keep the two in step from now "
+        "on; until then ?category= matches unlinked products by their string, which no index serves. "
+        "Once this has run, set PRODUCT_CATEGORY_LEGACY_MATCH=0 to drop that fallback."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Do everything in a transaction that is rolled back")
+        parser.add_argument("--create-missing", action="store_true",
+                            help="Create a root category for strings that match no category")
+
+    def handle(self, *args, **options):
+        from shop.cache import PRODUCT_LIST_TAG, category_ids_for_name, invalidate
+        from shop.models import Category, Product
+
+        dry_run = options["dry_run"]
+        linked = created = 0
+        unmatched, ambiguous = {}, {}
+
+        with transaction.atomic():
+            # Products without a category_fk: one UPDATE per distinct legacy string
+            strings = (
+                Product.objects.filter(category_fk__isnull=True).exclude(category="")
+                .values("category").annotate(n=Count("id")).order_by("category")
+            )
+            new_ids = {}
+            for row in strings:
+                name, count = row["category"], row["n"]
+                clean = " ".join(name.split())
+                ids = category_ids_for_name(name) or new_ids.get(clean.lower(), [])
+                if not ids and clean and options["create_missing"]:
+                    ids = new_ids[clean.lower()] = [Category.objects.create(name=clean).pk]
+                    created += 1
+                if not ids:
+                    unmatched[name] = count
+                elif len(ids) > 1:
+                    ambiguous[name] = count
+                else:
+                    linked += Product.objects.filter(category_fk__isnull=True, category=name).update(category_fk_id=ids[0])
+
+            # Linked products whose string drifted from the category name
+            drifted = Product.objects.filter(category_fk__isnull=False).exclude(category=F("category_fk__name"))
+            renamed = Product.objects.filter(pk__in=drifted.values("pk")).update(
+                category=Subquery(Category.objects.filter(pk=OuterRef("category_fk_id")).values("name")[:1])
+            )
+
+            if dry_run:
+                transaction.set_rollback(True)
+            elif linked or renamed:
+                # queryset.update sends no signals
+                invalidate("product", "home", PRODUCT_LIST_TAG)
+
+        prefix = "Would have" if dry_run else "Done:"
+        self.stdout.write(
+            f"{prefix} linked {linked} product(s), reset {renamed} category string(s), created {created} category(ies)"
+        )
+        for label, names in (("No category named", unmatched), ("Several categories named", ambiguous)):
+            for name, count in sorted(names.items()):
+                self.stdout.write(self.style.WARNING(f"  {label} {name!r}: {count} product(s) left unlinked"))
@@ -0,0 +1,186 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-request timings for the RequestMetricsMiddleware (settings.REQUEST_METRICS).
+# Histograms live in process memory, so each gunicorn worker reports its own
+# series; Prometheus sums them across scrape targets.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# (metric, help, buckets, RequestTimings attribute)
+HISTOGRAMS = (
+    ('shop_http_request_duration_seconds', 'Wall time spent handling the request.', DURATION_BUCKETS, 'total'),
+    ('shop_http_db_seconds', 'Time spent executing SQL.', DURATION_BUCKETS, 'db'),
+    ('shop_http_db_queries', 'SQL statements executed.', QUERY_BUCKETS, 'queries'),
+    ('shop_http_serialize_seconds', 'Time spent in DRF serializers (including the queries they run).', DURATION_BUCKETS, 'serialize'),
+    ('shop_http_render_seconds', 'Time spent rendering the response body.', DURATION_BUCKETS, 'render'),
+)
+
+_current = contextvars.ContextVar('shop_request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('queries', 'db', 'serialize', 'render', 'total', '_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.total = 0.0
+        self._depth = {}
+
+    def server_timing(self) -> str:
+        ms = lambda seconds: f"{seconds * 1000:.1f}"  # noqa: E731
+        return ', '.join((
+            f'db;dur={ms(self.db)};desc="{self.queries} queries"',
+            f'serialize;dur={ms(self.serialize)}',
+            f'render;dur={ms(self.render)}',
+            f'total;dur={ms(self.total)}',
+        ))
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def track():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(phase):
+    """Add the wall time of the block to ``phase`` of the current request; nested blocks count once."""
+    timings = _current.get()
+    if timings is None or timings._depth.get(phase):
+        yield
+        return
+    timings._depth[phase] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, phase, getattr(timings, phase) + time.perf_counter() - started)
+        timings._depth[phase] = 0
+
+
+def db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """Time every root ``serializer.data`` access. Only patched in when metrics are enabled."""
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+
+    def data(self):
+        with timer('serialize'):
+            return original.fget(self)
+
+    BaseSerializer.data = property(data)
+    _serializer_timing_installed = True
+
+
+class Registry:
+    """Cumulative Prometheus histograms keyed by (route, method) plus request and cache counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+        self._cache = {}
+
+    def count_cache(self, name, result):
+        # Counted whether or not REQUEST_METRICS is on: it is a dict increment
+        with self._lock:
+            self._cache[(name, result)] = self._cache.get((name, result), 0) + 1
+
+    def cache_hit_ratio(self, name):
+        with self._lock:
+            hits, misses = self._cache.get((name, 'hit'), 0), self._cache.get((name, 'miss'), 0)
+        return hits / (hits + misses) if hits + misses else None
+
+    def observe(self, route, method, status, timings):
+        key = (route, method)
+        with self._lock:
+            self._requests[key + (str(status),)] = self._requests.get(key + (str(status),), 0) + 1
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = {
+                    name: [[0] * len(buckets), 0.0, 0] for name, _, buckets, _ in HISTOGRAMS
+                }
+            for name, _, buckets, attr in HISTOGRAMS:
+                value = getattr(timings, attr)
+                counts, _, _ = entry = series[name]
+                for i, bound in enumerate(buckets):
+                    if value <= bound:
+                        counts[i] += 1
+                entry[1] += value
+                entry[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+            self._cache.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: {name: (list(c), s, n) for name, (c, s, n) in series.items()}
+                          for key, series in self._histograms.items()}
+            requests = dict(self._requests)
+            caches = dict(self._cache)
+        lines = [
+            '# HELP shop_http_requests_total Requests handled.',
+            '# TYPE shop_http_requests_total counter',
+        ]
+        for (route, method, status), n in sorted(requests.items()):
+            lines.append(f'shop_http_requests_total{{{_labels(route, method)},status="{status}"}} {n}')
+        lines.append('# HELP shop_cache_lookups_total Response cache lookups by result (hit/miss).')
+        lines.append('# TYPE shop_cache_lookups_total counter')
+        for (name, result), n in sorted(caches.items()):
+            lines.append(f'shop_cache_lookups_total{{cache="{name}",result="{result}"}} {n}')
+        for name, help_text, buckets, _ in HISTOGRAMS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (route, method), series in sorted(histograms.items()):
+                counts, total, n = series[name]
+                labels = _labels(route, method)
+                for bound, c in zip(buckets, counts):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {c}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {n}')
+                lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {n}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(route, method):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+
+registry = Registry()
@@ -0,0 +1,80 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI.
+
+    Stock WhiteNoiseMiddleware is sync-only, which makes Django push every ASGI
+    request (async views included) through a thread. Static lookups are an
+    in-memory dict hit, so the async path only needs to await the next layer.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """Per-request SQL, serializer and render timings as ``Server-Timing`` headers.
+
+    Enabled with ``REQUEST_METRICS``; when off Django drops the middleware at
+    startup, so disabled deployments pay nothing. Totals also feed the per-route
+    histograms served at ``/api/_metrics``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        metrics.install_serializer_timing()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with metrics.track() as timings, ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(metrics.db_wrapper))
+            response = self.get_response(request)
+            timings.total = time.perf_counter() - started
+        response['Server-Timing'] = timings.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        metrics.registry.observe(route, request.method, response.status_code, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; this middleware is
+        # outermost, so its hook runs last, right before render()
+        timings = metrics.current()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(resp):
+                timings.render += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
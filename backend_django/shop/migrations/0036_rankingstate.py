@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0035_product_external_ref'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='default', max_length=50, unique=True)),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('window_start', models.DateTimeField(blank=True, null=True)),
+                ('decayed_at', models.DateTimeField(blank=True, null=True)),
+                ('window_days', models.PositiveIntegerField(default=90)),
+                ('half_life_hours', models.PositiveIntegerField(default=168)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ranking state',
+                'verbose_name_plural': 'Ranking states',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    Category = apps.get_model('shop', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def resolve(pk, seen=()):
+        if pk not in paths:
+            parent_id = parents[pk]
+            if parent_id not in parents or parent_id in seen:
+                paths[pk] = f'/{pk}/'
+            else:
+                paths[pk] = f'{resolve(parent_id, seen + (pk,))}{pk}/'
+        return paths[pk]
+
+    Category.objects.bulk_update([Category(pk=pk, path=resolve(pk)) for pk in parents], ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0036_rankingstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models, transaction
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat, Lower, Substr
+
+ORDER_NUMBER_ATTEMPTS = 5
 
 
 class Category(models.Model):
@@ -10,6 +15,10 @@ class Category(models.Model):
         blank=True,
         related_name='children'
     )
+    # Materialized path of ids from the root down to this category, e.g.
+    # "/1/5/9/"; a category's subtree is every row whose path starts with its
+    # own (see category_subtree_range).
+    path = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
 
     class Meta:
         ordering = ["name"]
@@ -20,6 +29,87 @@ class Category(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.pk and self.parent_id and f'/{self.pk}/' in self._parent_path():
+            raise ValidationError({'parent': 'A category cannot be moved under itself or one of its descendants.'})
+
+    def _parent_path(self) -> str:
+        if not self.parent_id:
+            return '/'
+        path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+        return path or f'/{self.parent_id}/'
+
+    def save(self, *args, **kwargs):
+        # Keep ``path`` in step with ``parent``; a move rewrites the whole subtree with one UPDATE
+        parent_path = self._parent_path()
+        if self.pk is None:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.path = f'{parent_path}{self.pk}/'
+                Category.objects.filter(pk=self.pk).update(path=self.path)
+            return
+        if f'/{self.pk}/' in parent_path:
+            raise ValueError("A category cannot be moved under itself or one of its descendants.")
+        old_path, old_name = Category.objects.filter(pk=self.pk).values_list('path', 'name').first() or ('', None)
+        self.path = f'{parent_path}{self.pk}/'
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'path'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if old_path and old_path != self.path:
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(models.Value(self.path), Substr('path', len(old_path) + 1))
+                )
+            if old_name is not None and old_name != self.name:
+                # Linked products mirror the name in their legacy category string
+                Product.objects.filter(category_fk=self).update(category=self.name)
+
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every path from the parent links (after bulk_create or a queryset update of ``parent``)."""
+        rows = {pk: (parent_id, path) for pk, parent_id, path in cls.objects.values_list('id', 'parent_id', 'path')}
+        paths = {}
+
+        def resolve(pk, seen=()):
+            if pk not in paths:
+                parent_id = rows[pk][0]
+                if parent_id not in rows or parent_id in seen:
+                    paths[pk] = f'/{pk}/'
+                else:
+                    paths[pk] = f'{resolve(parent_id, seen + (pk,))}{pk}/'
+            return paths[pk]
+
+        changed = [cls(pk=pk, path=resolve(pk)) for pk in rows if resolve(pk) != rows[pk][1]]
+        cls.objects.bulk_update(changed, ['path'], batch_size=500)
+        return len(changed)
+
+
+def category_subtree_range(category_id) -> dict:
+    """Lookups matching the paths of ``category_id`` and all its descendants.
+
+    Descendant paths extend the category's own path ("/1/5/" -> "/1/5/9/"), so
+    they sort from that path up to the same string with its trailing "/" turned
+    into "0" ("/" sorts just before the digits). A range, unlike LIKE '%/5/%',
+    is read from the path index. The category's path comes from scalar
+    subqueries, so this costs no extra query; they are raw SQL because the
+    equivalent ORM expressions took longer to compile than the query ran.
+    """
+    table = Category._meta.db_table
+    params = (int(category_id),)
+    path = RawSQL(f"SELECT path FROM {table} WHERE id = %s", params, output_field=models.CharField())
+    upper = RawSQL(
+        f"SELECT SUBSTR(path, 1, LENGTH(path) - 1) || '0' FROM {table} WHERE id = %s", params,
+        output_field=models.CharField(),
+    )
+    return {'path__gte': path, 'path__lt': upper}
+
+
+def category_subtree(category_id):
+    """Ids of ``category_id`` and all its descendants, as a subquery."""
+    return Category.objects.filter(**category_subtree_range(category_id)).order_by().values('id')
+
 
 class Menu(models.Model):
     name = models.CharField(max_length=100)
@@ -66,7 +156,9 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image_url = models.URLField(blank=True, default='')
     image = models.ImageField(upload_to='products/', null=True, blank=True)
-    # Keep string category for frontend compatibility
+    # Resized/re-encoded copies of `image`, see shop.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Keep string category for frontend compatibility; set from category_fk on save
     category = models.CharField(max_length=100, blank=True, default='')
     # Optional FK to managed categories in Admin
     category_fk = models.ForeignKey(
@@ -83,10 +175,31 @@ class Product(models.Model):
     low_stock_threshold = models.PositiveIntegerField(default=5)
     notify_on_low_stock = models.BooleanField(default=True)
     style_template = models.ForeignKey('ProductStyleTemplate', on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
+    # Supplier/catalogue key used by `manage.py import_products` to upsert
+    external_ref = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    class Meta:
+        # One per catalogue ordering (see PRODUCT_ORDERINGS and the home loaders);
+        # ``manage.py check_query_plans`` asserts they are used. (price, id)
+        # serves "-price, -id" as a backward scan.
+        indexes = [
+            models.Index(fields=['category_fk', '-id'], name='product_category_newest_idx'),
+            models.Index(fields=['-popularity', '-id'], name='product_popular_idx'),
+            models.Index(fields=['-trend_score', '-id'], name='product_trend_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # category_fk is authoritative; the legacy string mirrors its name
+        if self.category_fk_id:
+            self.category = self.category_fk.name
+            if kwargs.get('update_fields') is not None and 'category_fk' in kwargs['update_fields']:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'category'}
+        super().save(*args, **kwargs)
+
 
 class SiteSetting(models.Model):
     home_product_limit = models.PositiveIntegerField(default=12)
@@ -147,6 +260,17 @@ class Order(models.Model):
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    # Account that placed the order; null for guest checkouts. Indexed through
+    # order_user_recent_idx, which also serves the newest-first history.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders',
+        db_index=False,
+    )
+
     customer_name = models.CharField(max_length=200)
     customer_email = models.EmailField(blank=True)
     customer_phone = models.CharField(max_length=50, blank=True)
@@ -158,35 +282,48 @@ class Order(models.Model):
     # Human-friendly unique order number
     order_number = models.CharField(max_length=30, unique=True, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Case-insensitive lookups by email: filter on Lower(customer_email) to use it
+            models.Index(Lower('customer_email'), name='order_email_lower_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['user', '-id'], name='order_user_recent_idx'),
+        ]
+
     def __str__(self) -> str:
         num = self.order_number or f"#{self.pk}"
         return f"Order {num} - {self.customer_name}"
 
     def save(self, *args, **kwargs):
-        if not self.order_number:
-            # Atomic generation to ensure uniqueness
-            with transaction.atomic():
-                site = SiteSetting.objects.select_for_update().first()
-                if site is None:
-                    site = SiteSetting.objects.create(home_product_limit=12)
-                site.order_counter = (site.order_counter or 0) + 1
-                prefix = site.order_prefix or ''
-                candidate = f"{prefix}{site.order_counter:06d}"
-                # In very rare case of conflict, increment until unique
-                while Order.objects.filter(order_number=candidate).exists():
-                    site.order_counter += 1
-                    candidate = f"{prefix}{site.order_counter:06d}"
-                self.order_number = candidate
-                site.save(update_fields=["order_counter"])
-        super().save(*args, **kwargs)
+        if self.order_number:
+            return super().save(*args, **kwargs)
+        from .order_numbers import allocator
+        for attempt in range(ORDER_NUMBER_ATTEMPTS):
+            self.order_number = allocator.allocate()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only retry when the number itself clashed (e.g. counter lowered in admin)
+                if not Order.objects.filter(order_number=self.order_number).exists() or attempt == ORDER_NUMBER_ATTEMPTS - 1:
+                    self.order_number = None
+                    raise
+                allocator.discard()
 
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey('Product', on_delete=models.PROTECT, related_name='order_items')
+    # Name at purchase time, so order history never joins Product
+    product_name = models.CharField(max_length=200, blank=True, default='')
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    def save(self, *args, **kwargs):
+        if not self.product_name and self.product_id:
+            self.product_name = self.product.name
+        super().save(*args, **kwargs)
+
     def line_total(self):
         try:
             return (self.price or 0) * (self.quantity or 0)
@@ -272,7 +409,7 @@ class Carousel(models.Model):
             return first_slide.image_url
         src = self.category_sources.all().order_by('order', 'id').first()
         if src and src.category_id:
-            qs = Product.objects.filter(category_fk=src.category)
+            qs = Product.objects.filter(category_fk_id__in=category_subtree(src.category_id))
             ordkey = src.ordering
             if ordkey == 'popular':
                 qs = qs.order_by('-popularity', '-id')
@@ -373,3 +510,24 @@ class PaymentGateway(models.Model):
 
     def __str__(self) -> str:
         return self.display_name or self.name
+
+
+class RankingState(models.Model):
+    """Watermarks for the incremental popularity/trend job (`manage.py compute_rankings`)."""
+    name = models.CharField(max_length=50, unique=True, default='default')
+    # Highest Order.id already counted
+    last_order_id = models.BigIntegerField(default=0)
+    # Orders created before this have already been subtracted from popularity
+    window_start = models.DateTimeField(null=True, blank=True)
+    # trend_score values are decayed as of this moment
+    decayed_at = models.DateTimeField(null=True, blank=True)
+    window_days = models.PositiveIntegerField(default=90)
+    half_life_hours = models.PositiveIntegerField(default=168)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Ranking state'
+        verbose_name_plural = 'Ranking states'
+
+    def __str__(self) -> str:
+        return f"Rankings ({self.name})"
@@ -0,0 +1,102 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.db.models import F
+
+
+class OrderNumberAllocator:
+    """Hands out order numbers from blocks reserved on SiteSetting.order_counter.
+
+    Each process reserves ``block_size`` numbers with one short UPDATE and then
+    allocates from memory, so concurrent checkouts no longer queue on the
+    SiteSetting row lock. Numbers stay unique but are not strictly sequential
+    across processes, and unused numbers of a block are skipped on restart.
+
+    The reservation commits on its own, outside the checkout's transaction, so
+    the row lock is released at once and a rolled back checkout cannot hand the
+    counter back while this process keeps using the block.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 1
+        self._end = 0
+        self._prefix = ''
+        self._executor = None
+        # (connection, on_commit callback) while the block is only reserved in an open transaction
+        self._pending = None
+
+    def get_block_size(self) -> int:
+        size = self.block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 20)
+        return max(1, int(size))
+
+    def _reserve_block(self, size):
+        from .models import SiteSetting
+
+        with transaction.atomic():
+            site_id = SiteSetting.objects.order_by('id').values_list('id', flat=True).first()
+            if site_id is None:
+                site_id = SiteSetting.objects.create(home_product_limit=12).id
+            # queryset.update: no post_save, so reserving never invalidates the home snapshot
+            SiteSetting.objects.filter(pk=site_id).update(order_counter=F('order_counter') + size)
+            return SiteSetting.objects.filter(pk=site_id).values_list('order_counter', 'order_prefix').get()
+
+    def _reserve_elsewhere(self, size):
+        # A helper thread has its own connection, which is not in the caller's transaction
+        def reserve():
+            close_old_connections()
+            return self._reserve_block(size)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='order-numbers')
+        return self._executor.submit(reserve).result()
+
+    def _reserve(self):
+        size = self.get_block_size()
+        connection = connections[DEFAULT_DB_ALIAS]
+        self._pending = None
+        if not connection.in_atomic_block:
+            end, prefix = self._reserve_block(size)
+        elif connection.vendor != 'sqlite':
+            end, prefix = self._reserve_elsewhere(size)
+        else:
+            # SQLite has one writer at a time, so a second connection would wait on
+            # the caller's own write lock. Reserve in the caller's transaction and
+            # give the block up unless that transaction commits.
+            end, prefix = self._reserve_block(size)
+
+            def confirm():
+                if self._pending and self._pending[1] is confirm:
+                    self._pending = None
+
+            transaction.on_commit(confirm)
+            self._pending = (connection, confirm)
+        self._next, self._end, self._prefix = end - size + 1, end, prefix or ''
+
+    def _pending_rolled_back(self) -> bool:
+        # on_commit callbacks are dropped when their transaction or savepoint rolls back
+        reserving, confirm = self._pending
+        if connections[DEFAULT_DB_ALIAS] is not reserving:
+            return True
+        return not any(func is confirm for _, func, _ in reserving.run_on_commit)
+
+    def allocate(self) -> str:
+        with self._lock:
+            if self._pending and self._pending_rolled_back():
+                self._next, self._end, self._pending = 1, 0, None
+            if self._next > self._end:
+                self._reserve()
+            number = self._next
+            self._next += 1
+            return f"{self._prefix}{number:06d}"
+
+    def discard(self):
+        # Drop the rest of the block, e.g. after a collision with a number in use
+        with self._lock:
+            self._next, self._end, self._pending = 1, 0, None
+
+
+allocator = OrderNumberAllocator()
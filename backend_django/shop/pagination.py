@@ -0,0 +1,180 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over the queryset's own ``order_by`` keys, e.g. ``(price, id)``.
+
+    Each page is a ``WHERE (keys) > (cursor)`` range read, so deep pages cost the same
+    as the first one and rows inserted concurrently never shift or repeat items.
+    ``id`` is appended to the ordering when missing to make the key unique.
+    """
+    page_size = 24
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_keys(self, queryset):
+        ordering = [str(o) for o in (queryset.query.order_by or queryset.model._meta.ordering or ())]
+        keys = [(o.lstrip('-'), o.startswith('-')) for o in ordering]
+        if not any(name in ('id', 'pk') for name, _ in keys):
+            keys.append(('id', keys[-1][1] if keys else False))
+        return keys
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(raw.encode('ascii')))
+            values = data['v']
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(data.get('r'))
+
+    def clean_values(self, queryset, values):
+        # Cursors are client input: coerce each value to its key's field type so a
+        # tampered cursor is a 404 rather than a type error from the database.
+        cleaned = []
+        for (name, _), value in zip(self.keys, values):
+            try:
+                field = self._field(queryset, name)
+                if value is None:
+                    raise ValidationError('null cursor value')
+                cleaned.append(field.to_python(value))
+            except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    @staticmethod
+    def _field(queryset, name):
+        # Annotations such as search_rank are keys too; they convert with their output_field
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        model = queryset.model
+        *relations, last = name.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        if last == 'pk':
+            return model._meta.pk
+        return model._meta.get_field(last)
+
+    def encode_cursor(self, values, reverse=False):
+        payload = {'v': values}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def _after(self, keys, values, reverse):
+        # (k1, k2, ...) strictly after (v1, v2, ...) in the given key directions
+        clauses = []
+        for i, (name, desc) in enumerate(keys):
+            lookup = 'lt' if desc != reverse else 'gt'
+            eq = {k: v for (k, _), v in zip(keys[:i], values[:i])}
+            clauses.append(Q(**eq, **{f'{name}__{lookup}': values[i]}))
+        return reduce(or_, clauses)
+
+    def _bind(self, request):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+
+    def _page_queryset(self, queryset, request):
+        self._bind(request)
+        self.page_size_value = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+        values, reverse = self.decode_cursor(request)
+        if values is not None:
+            if len(values) != len(self.keys):
+                raise NotFound(self.invalid_cursor_message)
+            values = self.clean_values(queryset, values)
+
+        order = [('-' if desc != reverse else '') + name for name, desc in self.keys]
+        qs = queryset.order_by(*order)
+        if values is not None:
+            qs = qs.filter(self._after(self.keys, values, reverse))
+        self._cursor = (values, reverse)
+        return qs[: self.page_size_value + 1]
+
+    def _set_page(self, rows):
+        values, reverse = self._cursor
+        has_more = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = rows
+        self.edges = (self._key_values(rows[0]), self._key_values(rows[-1])) if rows else None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._set_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """``paginate_queryset`` for async views, reading the page with the async ORM."""
+        return self._set_page([obj async for obj in self._page_queryset(queryset, request)])
+
+    def _key_values(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def page_state(self):
+        """What ``restore_page`` needs to rebuild this page's links for another request."""
+        return {'has_next': self.has_next, 'has_previous': self.has_previous, 'edges': self.edges}
+
+    def restore_page(self, request, state):
+        """Set up links for a page served from cache instead of ``paginate_queryset``."""
+        self._bind(request)
+        self.page = None
+        self.has_next, self.has_previous, self.edges = state['has_next'], state['has_previous'], state['edges']
+
+    def get_next_link(self):
+        if not self.has_next or not self.edges:
+            return None
+        return self.encode_cursor(self.edges[1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.edges:
+            return None
+        return self.encode_cursor(self.edges[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,132 @@
+import datetime
+import math
+
+from django.db import transaction
+from django.db.models import BigIntegerField, F, FloatField, Func, IntegerField, Max, Sum, Value
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import Order, OrderItem, Product, RankingState
+
+# Product.popularity: units sold in the last RankingState.window_days.
+# Product.trend_score: units sold, each weighted 0.5 ** (age / half-life), times
+# TREND_SCALE so the integer column keeps some resolution.
+TREND_SCALE = 100
+# trend_score is decayed in whole steps; decaying by a few seconds' worth on
+# every run would be swallowed by rounding.
+DECAY_STEP = datetime.timedelta(hours=1)
+# Orders younger than this are left for the next run so a transaction that
+# committed late with a lower id is never skipped by the watermark.
+DEFAULT_LAG = datetime.timedelta(seconds=60)
+EXCLUDED_STATUSES = ('canceled',)
+
+
+class EpochHour(Func):
+    """Whole hours since the Unix epoch, computed natively (TruncHour is a Python UDF on SQLite)."""
+    # EXTRACT returns numeric on Postgres 14+, which would reach Python as a Decimal
+    template = 'CAST(FLOOR(EXTRACT(EPOCH FROM %(expressions)s) / 3600) AS bigint)'
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template='CAST((julianday(%(expressions)s) - 2440587.5) * 24 AS INTEGER)', **extra_context
+        )
+
+
+def _counted_lines():
+    return OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)
+
+
+def _units_by_hour(lines):
+    return (
+        lines.values('product_id', hour=EpochHour('order__created_at'))
+        .annotate(units=Sum('quantity'))
+        .order_by()
+        .iterator(chunk_size=5000)
+    )
+
+
+def compute_rankings(now=None, rebuild=False, window_days=None, half_life_hours=None, lag=DEFAULT_LAG, batch_size=1000):
+    """Fold orders placed since the last run into popularity and trend_score.
+
+    Each run aggregates only the new order lines (grouped by product and hour),
+    subtracts the lines that slid out of the popularity window, decays every
+    trend_score with one UPDATE and writes the touched products back with
+    ``bulk_update``. ``rebuild`` (or a changed window/half-life) recomputes from
+    scratch. Status changes on already counted orders are only picked up by a rebuild.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        state, _ = RankingState.objects.select_for_update().get_or_create(name='default')
+        if window_days and window_days != state.window_days:
+            state.window_days, rebuild = window_days, True
+        if half_life_hours and half_life_hours != state.half_life_hours:
+            state.half_life_hours, rebuild = half_life_hours, True
+        if rebuild or state.decayed_at is None:
+            Product.objects.exclude(popularity=0, trend_score=0).update(popularity=0, trend_score=0)
+            state.last_order_id, state.window_start, state.decayed_at = 0, None, now
+
+        half_life = datetime.timedelta(hours=state.half_life_hours)
+        window_start = now - datetime.timedelta(days=state.window_days)
+
+        steps = (now - state.decayed_at) // DECAY_STEP
+        decayed = 0
+        if steps:
+            factor = 0.5 ** (steps * DECAY_STEP / half_life)
+            decayed = Product.objects.filter(trend_score__gt=0).update(
+                trend_score=Cast(Round(Cast(F('trend_score'), FloatField()) * Value(factor)), IntegerField())
+            )
+            state.decayed_at += steps * DECAY_STEP
+
+        popularity, trend, new_units = {}, {}, 0
+        horizon = Order.objects.filter(id__gt=state.last_order_id, created_at__lt=now - lag).aggregate(m=Max('id'))['m']
+        if horizon:
+            new_lines = _counted_lines().filter(
+                order_id__gt=state.last_order_id, order_id__lte=horizon, order__created_at__gte=window_start
+            )
+            reference_hour = state.decayed_at.timestamp() / 3600
+            for row in _units_by_hour(new_lines):
+                pid, units = row['product_id'], row['units']
+                # Age measured from the middle of the hour the order was placed in
+                age = reference_hour - (int(row['hour']) + 0.5)
+                popularity[pid] = popularity.get(pid, 0) + units
+                new_units += units
+                trend[pid] = trend.get(pid, 0.0) + units * TREND_SCALE * math.pow(0.5, age / state.half_life_hours)
+
+        expired_units = 0
+        if state.window_start and state.window_start < window_start and state.last_order_id:
+            expired = _counted_lines().filter(
+                order_id__lte=state.last_order_id,
+                order__created_at__gte=state.window_start,
+                order__created_at__lt=window_start,
+            )
+            for row in expired.values('product_id').annotate(units=Sum('quantity')).order_by().iterator(chunk_size=5000):
+                popularity[row['product_id']] = popularity.get(row['product_id'], 0) - row['units']
+                expired_units += row['units']
+
+        touched = sorted(set(popularity) | set(trend))
+        for start in range(0, len(touched), batch_size):
+            chunk = touched[start:start + batch_size]
+            products = list(Product.objects.filter(id__in=chunk).only('id', 'popularity', 'trend_score'))
+            for p in products:
+                p.popularity = max(0, p.popularity + popularity.get(p.id, 0))
+                p.trend_score = max(0, round(p.trend_score + trend.get(p.id, 0.0)))
+            Product.objects.bulk_update(products, ['popularity', 'trend_score'])
+
+        if horizon:
+            state.last_order_id = horizon
+        state.window_start = window_start
+        state.save()
+
+    if touched or decayed:
+        # update()/bulk_update() send no signals; both fields drive home sections and carousels
+        invalidate('product', 'home')
+    return {
+        'orders_through': state.last_order_id,
+        'products_updated': len(touched),
+        'new_units': new_units,
+        'expired_units': expired_units,
+        'decay_steps': steps,
+        'rebuild': rebuild,
+    }
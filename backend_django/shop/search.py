@@ -0,0 +1,155 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+# Full-text product search. SQLite uses an external-content FTS5 table kept in
+# sync by triggers; PostgreSQL uses a generated tsvector column with a GIN index.
+# Anything else (or an SQLite build without FTS5) falls back to icontains.
+
+FTS_TABLE = 'shop_product_fts'
+MAX_TERMS = 8
+
+SQLITE_TRIGGERS = {
+    'shop_product_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END""",
+    'shop_product_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        END""",
+    'shop_product_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS shop_product_fts_au AFTER UPDATE OF name, description ON shop_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END""",
+}
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+
+_ready = {}
+
+
+def _sqlite_has_fts5(cursor) -> bool:
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    if cursor.fetchone()[0]:
+        return True
+    # Some builds load FTS5 without reporting the compile option
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.shop_fts5_probe USING fts5(x)")
+        cursor.execute("DROP TABLE temp.shop_fts5_probe")
+        return True
+    except Exception:
+        return False
+
+
+def install_search_index(connection):
+    """Create the search index for ``connection`` if missing. Safe to call repeatedly.
+
+    On SQLite, table rebuilds done by later migrations drop the sync triggers; when
+    that happened the triggers are recreated and the index rebuilt from scratch.
+    """
+    _ready.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if 'shop_product' not in connection.introspection.table_names(cursor):
+            return
+        if connection.vendor == 'sqlite':
+            if not _sqlite_has_fts5(cursor):
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "name, description, content='shop_product', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'shop_product'")
+            existing = {row[0] for row in cursor.fetchall()}
+            if not set(SQLITE_TRIGGERS) <= existing:
+                for sql in SQLITE_TRIGGERS.values():
+                    cursor.execute(sql)
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "ALTER TABLE shop_product ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({POSTGRES_VECTOR}) STORED"
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS shop_product_search_idx ON shop_product USING GIN (search_vector)")
+
+
+def remove_search_index(connection):
+    _ready.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS shop_product_search_idx")
+            cursor.execute("ALTER TABLE shop_product DROP COLUMN IF EXISTS search_vector")
+
+
+def search_backend(alias='default') -> str:
+    """'fts5', 'tsvector' or 'icontains' depending on what the database provides."""
+    if alias not in _ready:
+        connection = connections[alias]
+        backend = 'icontains'
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                if cursor.fetchone():
+                    backend = 'fts5'
+            elif connection.vendor == 'postgresql':
+                columns = connection.introspection.get_table_description(cursor, 'shop_product')
+                if any(col.name == 'search_vector' for col in columns):
+                    backend = 'tsvector'
+        _ready[alias] = backend
+    return _ready[alias]
+
+
+async def asearch_backend(alias='default') -> str:
+    """``search_backend`` for async views; the first call per alias probes the schema."""
+    if alias in _ready:
+        return _ready[alias]
+    return await sync_to_async(search_backend)(alias)
+
+
+def search_terms(q: str):
+    return re.findall(r'[^\W_]+', (q or '').lower())[:MAX_TERMS]
+
+
+def search_products(qs, q, rank=True):
+    """Filter ``qs`` to products matching ``q`` and annotate ``search_rank`` (higher is better).
+
+    Every term must match; the last term is treated as a prefix so results update
+    while the user is still typing. ``rank=False`` skips the ranking annotation,
+    e.g. for counts.
+    """
+    terms = search_terms(q)
+    backend = search_backend(qs.db) if terms else 'icontains'
+    if backend == 'fts5':
+        match = ' '.join(f'"{t}"' for t in terms) + '*'
+        qs = qs.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = shop_product.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+        )
+        if rank:
+            qs = qs.annotate(search_rank=RawSQL(f'-{FTS_TABLE}.rank', (), output_field=models.FloatField()))
+        return qs
+    if backend == 'tsvector':
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        qs = qs.extra(
+            where=["shop_product.search_vector @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+        )
+        if rank:
+            qs = qs.annotate(search_rank=RawSQL(
+                "ts_rank_cd(shop_product.search_vector, to_tsquery('simple', %s))", (tsquery,),
+                output_field=models.FloatField(),
+            ))
+        return qs
+    return qs.filter(models.Q(name__icontains=q) | models.Q(description__icontains=q))
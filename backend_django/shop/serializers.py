@@ -1,7 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from .models import Product, Category, HomeSection, CarouselItem, SiteSetting, Carousel, CarouselSlide, HomeCarouselSection, ProductStyleTemplate, Order, OrderItem, Menu, MenuItem, PaymentSetting, PaymentGateway
+from .cache import category_ids_for_name
+from .loaders import load_section_products, materialize_carousels
+from .images import variant_urls
+from .inventory import InsufficientStock, reserve_stock
 
 class ProductStyleTemplateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,9 +26,39 @@ class ProductStyleTemplateSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+def _field_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    return [f.strip() for f in value if f and f.strip()]
+
+
+class SparseFieldsMixin:
+    """Accepts ``fields=`` / ``exclude=`` (kwargs or comma-separated query parameters)."""
+
+    def __init__(self, *args, **kwargs):
+        fields = _field_list(kwargs.pop('fields', None))
+        exclude = _field_list(kwargs.pop('exclude', None))
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        # Query parameters only shape reads; writes always see every field
+        if request is not None and self.parent is None and request.method in ('GET', 'HEAD', 'OPTIONS'):
+            if fields is None:
+                fields = _field_list(request.query_params.get('fields'))
+            if exclude is None:
+                exclude = _field_list(request.query_params.get('exclude'))
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in exclude or ():
+            self.fields.pop(name, None)
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image = serializers.ImageField(read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     is_available = serializers.SerializerMethodField()
     is_low_stock = serializers.SerializerMethodField()
     style_template = ProductStyleTemplateSerializer(read_only=True)
@@ -37,6 +73,9 @@ class ProductSerializer(serializers.ModelSerializer):
             return obj.image_url
         return getattr(settings, 'PLACEHOLDER_IMAGE_URL', 'https://via.placeholder.com/800x800?text=No+Image')
 
+    def get_image_variants(self, obj: Product):
+        return variant_urls(obj.image_variants)
+
     class Meta:
         model = Product
         fields = [
@@ -46,6 +85,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "price",
             "image_url",  # effective URL (uploaded image preferred)
             "image",      # raw uploaded file path (read-only)
+            "image_variants",  # resized JPEG/WebP URLs + srcset, null until generated
             "category",
             "in_stock",
             "stock_qty",
@@ -56,6 +96,14 @@ class ProductSerializer(serializers.ModelSerializer):
             "style_template",
         ]
 
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if 'category' in attrs:
+            # The frontend writes the category by name: link it when the name is unambiguous
+            ids = category_ids_for_name(attrs['category']) if attrs['category'].strip() else []
+            attrs['category_fk_id'] = ids[0] if len(ids) == 1 else None
+        return attrs
+
     def get_is_available(self, obj: Product) -> bool:
         return bool(obj.in_stock and (obj.stock_qty is None or obj.stock_qty > 0))
 
@@ -66,6 +114,54 @@ class ProductSerializer(serializers.ModelSerializer):
             return False
 
 
+class ProductCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Compact product for grids; the style template is referenced by id only.
+
+    Lists using it publish the templates once via ``style_template_map``.
+    """
+    image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    is_available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ["id", "name", "price", "image_url", "image_srcset", "in_stock", "is_available", "style_template_id"]
+
+    def _variants(self, obj: Product):
+        return variant_urls(obj.image_variants) or {}
+
+    def get_image_url(self, obj: Product):
+        variants = self._variants(obj)
+        if 'card' in variants:
+            return variants['card']['url']
+        return ProductSerializer.get_image_url(self, obj)
+
+    def get_image_srcset(self, obj: Product):
+        return self._variants(obj).get('srcset') or None
+
+    def get_is_available(self, obj: Product) -> bool:
+        return ProductSerializer.get_is_available(self, obj)
+
+
+def style_template_map(products):
+    """``{id: template}`` for the style templates used by ``products`` (joined, no queries)."""
+    templates = {}
+    for p in products:
+        if p.style_template_id and p.style_template_id not in templates:
+            templates[p.style_template_id] = p.style_template
+    return {str(tid): ProductStyleTemplateSerializer(t).data for tid, t in templates.items()}
+
+
+def _product_data(products, context):
+    # Serialize each product once per payload, even if several sections show it
+    memo = context.setdefault('product_data', {})
+    missing = [p for p in products if p.id not in memo]
+    if missing:
+        for p, data in zip(missing, ProductCardSerializer(missing, many=True).data):
+            memo[p.id] = data
+    return [memo[p.id] for p in products]
+
+
 class CategoryChildSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -99,17 +195,11 @@ class HomeSectionSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "kind", "category", "category_name", "limit", "columns", "order", "products"]
 
     def get_products(self, obj: HomeSection):
-        qs = Product.objects.all()
-        if obj.kind == 'category' and obj.category_id:
-            qs = qs.filter(category_fk=obj.category).order_by('-id')
-        elif obj.kind == 'popular':
-            qs = qs.order_by('-popularity', '-id')
-        elif obj.kind == 'trend':
-            qs = qs.order_by('-trend_score', '-id')
-        else:  # newest or default
-            qs = qs.order_by('-id')
-        qs = qs[: obj.limit]
-        return ProductSerializer(qs, many=True).data
+        # HomeConfigSerializer loads every section in one batch; fall back for standalone use
+        batch = self.context.get('section_products')
+        if batch is None or obj.id not in batch:
+            batch = load_section_products([obj])
+        return _product_data(batch.get(obj.id, []), self.context)
 
 
 class CarouselSlideSerializer(serializers.ModelSerializer):
@@ -126,37 +216,11 @@ class CarouselSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "animation", "speed_ms", "single_slider", "slider_height_px", "order", "slides"]
 
     def get_slides(self, obj: Carousel):
-        # Manual slides first
-        manual = list(CarouselSlideSerializer(obj.slides.all().order_by('order', 'id'), many=True).data)
-        # Then slides generated from category sources
-        gen = []
-        for src in getattr(obj, 'category_sources', []).all().order_by('order', 'id'):
-            qs = Product.objects.filter(category_fk=src.category)
-            ordkey = src.ordering
-            if ordkey == 'popular':
-                qs = qs.order_by('-popularity', '-id')
-            elif ordkey == 'trend':
-                qs = qs.order_by('-trend_score', '-id')
-            elif ordkey == 'price_asc':
-                qs = qs.order_by('price', 'id')
-            elif ordkey == 'price_desc':
-                qs = qs.order_by('-price', '-id')
-            else:
-                qs = qs.order_by('-id')
-            qs = qs[: src.limit]
-            for p in qs:
-                try:
-                    img = p.image.url if p.image else (p.image_url or '')
-                except Exception:
-                    img = p.image_url or ''
-                gen.append({
-                    'id': p.id,
-                    'title': p.name,
-                    'image_url': img,
-                    'link_url': f"/product/{p.id}",
-                    'order': 0,
-                })
-        return manual + gen
+        # HomeConfigSerializer passes slides materialized for all carousels at once
+        materialized = self.context.get('carousel_slides')
+        if materialized is None or obj.id not in materialized:
+            materialized = {cid: slides for cid, (_, slides) in materialize_carousels([obj.id]).items()}
+        return materialized.get(obj.id, [])
 
 
 class HomeConfigSerializer(serializers.ModelSerializer):
@@ -164,6 +228,7 @@ class HomeConfigSerializer(serializers.ModelSerializer):
     carousels = serializers.SerializerMethodField()
     carousel_sections = serializers.SerializerMethodField()
     primary_menu = serializers.SerializerMethodField()
+    style_templates = serializers.SerializerMethodField()
 
     class Meta:
         model = SiteSetting
@@ -193,27 +258,47 @@ class HomeConfigSerializer(serializers.ModelSerializer):
             'sections',
             'carousels',
             'carousel_sections',
+            'style_templates',
         ]
 
+    def to_representation(self, instance: SiteSetting):
+        prefetch_related_objects(
+            [instance],
+            Prefetch('sections', queryset=HomeSection.objects.select_related('category')),
+            Prefetch('carousel_sections', queryset=HomeCarouselSection.objects.order_by('order', 'id')),
+        )
+        self.context['section_products'] = load_section_products(instance.sections.all())
+        return super().to_representation(instance)
+
+    def get_style_templates(self, obj: SiteSetting):
+        # Section products are cards; their templates are emitted once here
+        batch = self.context.get('section_products') or {}
+        return style_template_map(p for products in batch.values() for p in products)
+
+    def _carousel_data(self, obj: SiteSetting):
+        # Build every referenced carousel once; both carousel fields reuse the result
+        data = self.context.get('carousel_data')
+        if data is None:
+            materialized = materialize_carousels(s.carousel_id for s in obj.carousel_sections.all())
+            slides = {cid: items for cid, (_, items) in materialized.items()}
+            data = {
+                cid: CarouselSerializer(carousel, context={'carousel_slides': slides}).data
+                for cid, (carousel, _) in materialized.items()
+            }
+            self.context['carousel_data'] = data
+        return data
+
     def get_carousels(self, obj: SiteSetting):
-        sections = obj.carousel_sections.all().order_by('order', 'id')
-        if not sections:
-            return []
-        carousel_ids = [s.carousel_id for s in sections]
-        carousels = Carousel.objects.filter(id__in=carousel_ids).prefetch_related('slides')
-        by_id = {c.id: c for c in carousels}
-        ordered = [by_id[cid] for cid in carousel_ids if cid in by_id]
-        return CarouselSerializer(ordered, many=True).data
+        data = self._carousel_data(obj)
+        return [data[s.carousel_id] for s in obj.carousel_sections.all() if s.carousel_id in data]
 
     def get_carousel_sections(self, obj: SiteSetting):
-        items = []
-        for s in obj.carousel_sections.all().order_by('order', 'id'):
-            items.append({
-                'id': s.id,
-                'order': s.order,
-                'carousel': CarouselSerializer(s.carousel).data,
-            })
-        return items
+        data = self._carousel_data(obj)
+        return [
+            {'id': s.id, 'order': s.order, 'carousel': data[s.carousel_id]}
+            for s in obj.carousel_sections.all()
+            if s.carousel_id in data
+        ]
 
 
 class MenuItemSerializer(serializers.ModelSerializer):
@@ -274,8 +359,26 @@ class PaymentGatewaySerializer(serializers.ModelSerializer):
         fields = ("id", "name", "display_name", "code", "enabled", "test_mode", "button_label", "order")
 
 
+class OrderProductField(serializers.PrimaryKeyRelatedField):
+    # Resolves against the products OrderSerializer loaded for the whole basket
+    def to_internal_value(self, data):
+        products = self.context.get('order_products')
+        if products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in products:
+            self.fail('does_not_exist', pk_value=data)
+        return products[pk]
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.CharField(source='product.name', read_only=True)
+    product = OrderProductField(queryset=Product.objects.all())
+    product_name = serializers.CharField(read_only=True)
 
     class Meta:
         model = OrderItem
@@ -304,9 +407,27 @@ class OrderSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("status", "total", "created_at", "updated_at")
 
+    def to_internal_value(self, data):
+        # Load every product in the basket with one query instead of one per line
+        ids = set()
+        items = data.get('items') if hasattr(data, 'get') else None
+        # Ids the pk column cannot hold are left out so they fail as does_not_exist
+        low, high = connection.ops.integer_field_range(Product._meta.pk.get_internal_type())
+        if isinstance(items, list):
+            for it in items:
+                if isinstance(it, dict) and not isinstance(it.get('product'), bool):
+                    try:
+                        pk = int(it.get('product'))
+                    except (TypeError, ValueError):
+                        continue
+                    if low <= pk <= high:
+                        ids.add(pk)
+        self.context['order_products'] = Product.objects.in_bulk(ids) if ids else {}
+        return super().to_internal_value(data)
+
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        order = Order.objects.create(**validated_data)
+        lines = []
         total = 0
         for it in items_data:
             product = it.get('product')
@@ -314,11 +435,26 @@ class OrderSerializer(serializers.ModelSerializer):
             price = it.get('price')
             if price is None and product is not None:
                 price = product.price
-            oi = OrderItem.objects.create(order=order, product=product, quantity=qty, price=price)
+            lines.append(OrderItem(product=product, product_name=product.name if product else '', quantity=qty, price=price))
             try:
-                total += (oi.price or 0) * (oi.quantity or 0)
+                total += (price or 0) * qty
             except Exception:
                 pass
-        order.total = total
-        order.save(update_fields=["total"])
+        quantities = {}
+        for line in lines:
+            quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+        with transaction.atomic():
+            # Take stock first so a rejected basket never consumes an order number
+            try:
+                reserve_stock(quantities)
+            except InsufficientStock as exc:
+                raise serializers.ValidationError({'items': [
+                    f"Only {available} left of product {pid}." for pid, available in sorted(exc.available.items())
+                ]})
+            order = Order.objects.create(total=total, **validated_data)
+            for line in lines:
+                line.order = order
+            OrderItem.objects.bulk_create(lines)
+        # Serve the response from the lines we already hold
+        order._prefetched_objects_cache = {'items': lines}
         return order
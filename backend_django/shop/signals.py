@@ -0,0 +1,145 @@
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .cache import PRODUCT_LIST_TAG, invalidate, invalidate_home, product_state_tags
+from .images import refresh_product_variants
+from .search import install_search_index
+from .models import (
+    SiteSetting, HomeSection, HomeCarouselSection, Carousel, CarouselSlide, CarouselCategorySource,
+    Menu, MenuItem, Product, Category, ProductStyleTemplate, PaymentSetting, PaymentGateway,
+)
+
+# Everything that feeds the home page payload
+HOME_MODELS = (
+    SiteSetting,
+    HomeSection,
+    HomeCarouselSection,
+    Carousel,
+    CarouselSlide,
+    CarouselCategorySource,
+    Menu,
+    MenuItem,
+    Product,
+    Category,
+    ProductStyleTemplate,
+)
+
+
+def home_content_changed(sender, **kwargs):
+    invalidate_home()
+
+
+for _model in HOME_MODELS:
+    post_save.connect(home_content_changed, sender=_model, dispatch_uid=f"home_save_{_model.__name__}")
+    post_delete.connect(home_content_changed, sender=_model, dispatch_uid=f"home_delete_{_model.__name__}")
+
+
+def category_changed(sender, **kwargs):
+    invalidate('category')
+
+
+def product_changed(sender, **kwargs):
+    invalidate('product')
+
+
+# Product list cache: evict only the lists a write can change. pre_save
+# remembers where the row was listed before, so moving a product out of a
+# category evicts that category's lists too.
+
+def _product_list_tags(product):
+    name = path = ''
+    if product.category_fk_id:
+        try:
+            name, path = product.category_fk.name, product.category_fk.path
+        except Category.DoesNotExist:
+            pass
+    return product_state_tags(product.category, product.category_fk_id, name, path)
+
+
+def product_list_before_save(sender, instance, raw=False, **kwargs):
+    instance._list_tags_before = set()
+    if raw or instance.pk is None:
+        return
+    row = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list('category', 'category_fk_id', 'category_fk__name', 'category_fk__path')
+        .first()
+    )
+    if row:
+        instance._list_tags_before = product_state_tags(*row)
+
+
+def product_list_changed(sender, instance, **kwargs):
+    invalidate(*sorted(_product_list_tags(instance) | getattr(instance, '_list_tags_before', set())))
+
+
+def category_list_before_save(sender, instance, raw=False, **kwargs):
+    instance._list_tags_before = set()
+    instance._renamed = False
+    if raw or instance.pk is None:
+        return
+    old = Category.objects.filter(pk=instance.pk).values_list('name', 'path').first()
+    if old:
+        instance._list_tags_before = product_state_tags(category_name=old[0], category_path=old[1])
+        instance._renamed = old[0] != instance.name
+
+
+def category_list_changed(sender, instance, **kwargs):
+    # A move changes what the old and the new ancestors list
+    tags = product_state_tags(category_id=instance.pk, category_name=instance.name, category_path=instance.path)
+    if getattr(instance, '_renamed', False):
+        # Category.save rewrote its products' category strings
+        tags.add('product')
+    invalidate(*sorted(tags | getattr(instance, '_list_tags_before', set())))
+
+
+def category_deleted(sender, **kwargs):
+    # Children were re-parented to the root by SET_NULL, which sends no signals
+    Category.rebuild_paths()
+
+
+def style_template_list_changed(sender, **kwargs):
+    invalidate(PRODUCT_LIST_TAG)
+
+
+def product_image_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = (instance.image_variants or {}).get('source', '')
+    if refresh_product_variants(instance).get('source', '') != before:
+        invalidate('product', 'home')
+
+
+def payment_setting_changed(sender, **kwargs):
+    invalidate('payment_setting')
+
+
+def payment_gateway_changed(sender, **kwargs):
+    invalidate('payment_gateway')
+
+
+post_save.connect(category_changed, sender=Category, dispatch_uid="category_version_save")
+post_delete.connect(category_changed, sender=Category, dispatch_uid="category_version_delete")
+# Product payloads embed their style template
+for _model in (Product, ProductStyleTemplate):
+    post_save.connect(product_changed, sender=_model, dispatch_uid=f"product_version_save_{_model.__name__}")
+    post_delete.connect(product_changed, sender=_model, dispatch_uid=f"product_version_delete_{_model.__name__}")
+post_save.connect(product_image_saved, sender=Product, dispatch_uid="product_image_variants")
+pre_save.connect(product_list_before_save, sender=Product, dispatch_uid="product_list_before_save")
+post_save.connect(product_list_changed, sender=Product, dispatch_uid="product_list_save")
+post_delete.connect(product_list_changed, sender=Product, dispatch_uid="product_list_delete")
+pre_save.connect(category_list_before_save, sender=Category, dispatch_uid="category_list_before_save")
+post_save.connect(category_list_changed, sender=Category, dispatch_uid="category_list_save")
+post_delete.connect(category_list_changed, sender=Category, dispatch_uid="category_list_delete")
+post_delete.connect(category_deleted, sender=Category, dispatch_uid="category_paths_delete")
+post_save.connect(style_template_list_changed, sender=ProductStyleTemplate, dispatch_uid="style_template_list_save")
+post_delete.connect(style_template_list_changed, sender=ProductStyleTemplate, dispatch_uid="style_template_list_delete")
+post_save.connect(payment_setting_changed, sender=PaymentSetting, dispatch_uid="payment_setting_version_save")
+post_delete.connect(payment_setting_changed, sender=PaymentSetting, dispatch_uid="payment_setting_version_delete")
+post_save.connect(payment_gateway_changed, sender=PaymentGateway, dispatch_uid="payment_gateway_version_save")
+post_delete.connect(payment_gateway_changed, sender=PaymentGateway, dispatch_uid="payment_gateway_version_delete")
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    # Later migrations may rebuild shop_product on SQLite, dropping the FTS triggers
+    install_search_index(connections[using])
@@ -1,6 +1,7 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import ProductViewSet, CategoryViewSet, HomeConfigView, RegisterView, LoginView, LogoutView, MeView, OrderViewSet, CsrfView, BootstrapSuperuserView, PaymentSettingView, PaymentGatewayView
+from . import async_views
+from .views import ProductViewSet, CategoryViewSet, HomeConfigView, RegisterView, LoginView, LogoutView, MeView, OrderViewSet, CsrfView, BootstrapSuperuserView, PaymentSettingView, PaymentGatewayView, MetricsView
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
@@ -18,4 +19,12 @@ urlpatterns = [
     path('auth/bootstrap-superuser/', BootstrapSuperuserView.as_view()),
     path('payment/settings/', PaymentSettingView.as_view()),
     path('payment/gateways/', PaymentGatewayView.as_view()),
+    path('_metrics', MetricsView.as_view()),
+    # Async (ASGI) twins of the hot read endpoints
+    path('async/home/', async_views.home),
+    path('async/products/', async_views.product_list),
+    path('async/products/<int:pk>/', async_views.product_detail),
+    path('async/categories/tree/', async_views.category_tree),
+    path('async/payment/settings/', async_views.payment_settings),
+    path('async/payment/gateways/', async_views.payment_gateways),
 ]
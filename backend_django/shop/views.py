@@ -1,52 +1,101 @@
 from rest_framework import viewsets, decorators, response, status, permissions
 from rest_framework.views import APIView
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.conf import settings
-from .models import Product, Category, SiteSetting, Order, PaymentSetting, PaymentGateway
-from .serializers import ProductSerializer, CategoryTreeSerializer, HomeConfigSerializer, UserSerializer, OrderSerializer, PaymentSettingSerializer, PaymentGatewaySerializer
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from .models import Product, Category, Order, PaymentSetting, PaymentGateway
+from .cache import (
+    get_home_snapshot, get_category_tree, product_version_name, sparse_fields, version_etag,
+    get_product_list_page, set_product_list_page, product_list_key, product_list_tags,
+)
+from .metrics import registry
+from .exports import EXPORT_FORMATS, astream, export_filters, export_queryset, iter_orders, render_orders
+from .filters import filter_products, product_filters
+from .facets import get_facets, DEFAULT_BUCKETS
+from .pagination import KeysetPagination
+from .serializers import ProductSerializer, ProductCardSerializer, style_template_map, CategoryTreeSerializer, UserSerializer, OrderSerializer, PaymentSettingSerializer, PaymentGatewaySerializer
+
+
+def _product_etag(request, *args, **kwargs):
+    # ?fields=/?exclude= select a different representation of the same product
+    return version_etag('product', product_version_name(kwargs.get('pk', '')), extra=sparse_fields(request.GET))
+
+
+def _category_tree_etag(request, *args, **kwargs):
+    if _wants_counts(request):
+        return version_etag('category', 'product', extra='counts')
+    return version_etag('category')
+
+
+def _wants_counts(request) -> bool:
+    return (request.GET.get('counts') or '').lower() in ('1', 'true', 'yes')
 
 
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by('id')
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        q = self.request.query_params.get('q')
-        if q:
-            qs = qs.filter(models.Q(name__icontains=q) | models.Q(description__icontains=q))
-        category_id = self.request.query_params.get('category_id')
-        if category_id and str(category_id).isdigit():
-            qs = qs.filter(category_fk_id=int(category_id))
-        category_name = self.request.query_params.get('category')
-        if category_name:
-            qs = qs.filter(models.Q(category__iexact=category_name) | models.Q(category_fk__name__iexact=category_name))
-        min_price = self.request.query_params.get('min_price')
-        if min_price not in (None, ""):
-            try:
-                qs = qs.filter(price__gte=min_price)
-            except Exception:
-                pass
-        max_price = self.request.query_params.get('max_price')
-        if max_price not in (None, ""):
-            try:
-                qs = qs.filter(price__lte=max_price)
-            except Exception:
-                pass
-        ordering = (self.request.query_params.get('ordering') or '').lower()
-        if ordering == 'newest':
-            qs = qs.order_by('-id')
-        elif ordering == 'oldest':
-            qs = qs.order_by('id')
-        elif ordering == 'price_asc':
-            qs = qs.order_by('price', 'id')
-        elif ordering == 'price_desc':
-            qs = qs.order_by('-price', '-id')
-        return qs
+        qs = super().get_queryset().select_related('style_template')
+        return filter_products(qs, product_filters(self.request.query_params))
+
+    def _card_view(self) -> bool:
+        return self.action == 'list' and (self.request.query_params.get('view') or '').lower() == 'card'
+
+    def get_serializer_class(self):
+        if self._card_view():
+            return ProductCardSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        if not settings.PRODUCT_LIST_CACHE_TIMEOUT:
+            return self._list(request, *args, **kwargs)
+        filters = product_filters(request.query_params)
+        key = product_list_key(request, filters, self.paginator.get_page_size(request), card=self._card_view())
+        page, versions = get_product_list_page(key, product_list_tags(filters))
+        if page is not None:
+            self.paginator.restore_page(request, page['state'])
+            resp = self.paginator.get_paginated_response(page['results'])
+            if 'style_templates' in page:
+                resp.data['style_templates'] = page['style_templates']
+            resp['X-Cache'] = 'HIT'
+            return resp
+        resp = self._list(request, *args, **kwargs)
+        if resp.status_code == 200:
+            page = {'state': self.paginator.page_state(), 'results': list(resp.data['results'])}
+            if 'style_templates' in resp.data:
+                page['style_templates'] = resp.data['style_templates']
+            set_product_list_page(key, versions, page)
+        resp['X-Cache'] = 'MISS'
+        return resp
+
+    def _list(self, request, *args, **kwargs):
+        resp = super().list(request, *args, **kwargs)
+        if self._card_view() and isinstance(resp.data, dict):
+            resp.data['style_templates'] = style_template_map(self.paginator.page)
+        return resp
+
+    @method_decorator(condition(etag_func=_product_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @decorators.action(detail=False, methods=['get'])
+    def facets(self, request):
+        try:
+            buckets = int(request.query_params.get('buckets') or DEFAULT_BUCKETS)
+        except ValueError:
+            buckets = DEFAULT_BUCKETS
+        return response.Response(get_facets(product_filters(request.query_params), buckets))
 
     @decorators.action(detail=True, methods=['post'])
     def clone(self, request, pk=None):
@@ -55,6 +104,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         except Exception:
             return response.Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
         src.pk = None
+        src.external_ref = None
         src.name = f"{src.name} (Copy)"
         src.save()
         return response.Response(ProductSerializer(src).data, status=status.HTTP_201_CREATED)
@@ -64,20 +114,26 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.filter(parent__isnull=True).order_by('name')
     serializer_class = CategoryTreeSerializer
 
+    def _tree_response(self, request):
+        return response.Response(get_category_tree(with_counts=_wants_counts(request)))
+
+    @method_decorator(condition(etag_func=_category_tree_etag))
+    def list(self, request, *args, **kwargs):
+        return self._tree_response(request)
+
     @decorators.action(detail=False, methods=['get'], url_path='tree')
+    @method_decorator(condition(etag_func=_category_tree_etag))
     def tree(self, request):
-        roots = Category.objects.filter(parent__isnull=True).order_by('name')
-        data = CategoryTreeSerializer(roots, many=True).data
-        return response.Response(data)
+        return self._tree_response(request)
 
 
 class HomeConfigView(APIView):
+    # Public, read-only: skip session lookups so a warm request runs no queries
+    authentication_classes = []
+
+    @method_decorator(condition(etag_func=lambda request, *args, **kwargs: version_etag('home')))
     def get(self, request):
-        site = SiteSetting.objects.first()
-        if not site:
-            site = SiteSetting.objects.create(home_product_limit=12)
-        serializer = HomeConfigSerializer(instance=site)
-        return response.Response(serializer.data)
+        return HttpResponse(get_home_snapshot(), content_type='application/json')
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -143,13 +199,43 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all().order_by('-id')
     serializer_class = OrderSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().prefetch_related('items')
+        # Lists and single orders alike: staff see everything, customers their own
+        # orders, guests reach their guest orders by email (never a member's)
+        user = self.request.user
         email = (self.request.query_params.get('email') or '').strip()
+        if user.is_authenticated and not user.is_staff:
+            return qs.filter(user=user)
         if email:
-            qs = qs.filter(customer_email__iexact=email)
-        return qs
+            # Matches the functional index on Lower(customer_email)
+            qs = qs.alias(email_lower=Lower('customer_email')).filter(email_lower=Lower(Value(email)))
+            return qs if user.is_staff else qs.filter(user__isnull=True)
+        return qs if user.is_staff else qs.none()
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        serializer.save(user=user if user.is_authenticated else None)
+
+    @decorators.action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Stream orders with their lines as NDJSON (default) or CSV: ?output=csv&from=&to=&status=."""
+        fmt = (request.query_params.get('output') or 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return response.Response({"detail": f"output must be one of {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filters = export_filters(request.query_params)
+        except ValueError as exc:
+            return response.Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson'
+        content = render_orders(iter_orders(export_queryset(filters)), fmt)
+        if isinstance(request._request, ASGIRequest):
+            content = astream(content)
+        resp = StreamingHttpResponse(content, content_type=content_type)
+        resp['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+        return resp
 
 
 class CsrfView(APIView):
@@ -184,6 +270,7 @@ class BootstrapSuperuserView(APIView):
 class PaymentSettingView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @method_decorator(condition(etag_func=lambda request, *args, **kwargs: version_etag('payment_setting')))
     def get(self, request):
         obj, _ = PaymentSetting.objects.get_or_create(defaults={"enabled": True})
         data = PaymentSettingSerializer(obj).data
@@ -193,6 +280,21 @@ class PaymentSettingView(APIView):
 class PaymentGatewayView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @method_decorator(condition(etag_func=lambda request, *args, **kwargs: version_etag('payment_gateway')))
     def get(self, request):
         qs = PaymentGateway.objects.filter(enabled=True).order_by('order', 'id')
         return response.Response(PaymentGatewaySerializer(qs, many=True).data)
+
+
+class MetricsView(APIView):
+    """Prometheus text exposition of the per-route request histograms."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise Http404()
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+            return response.Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
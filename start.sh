@@ -9,5 +9,15 @@ python manage.py migrate --noinput
 python manage.py create_initial_superuser || true
 python manage.py collectstatic --noinput
 
+WORKERS="${WEB_CONCURRENCY:-3}"
+
+# SERVER_MODE=asgi runs uvicorn worker processes so the async read endpoints
+# under /api/async/ (home, products, categories tree, payment settings and
+# gateways) serve many concurrent requests per worker; sync views keep working
+# there, Django runs them in a thread. Default remains gunicorn/WSGI.
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+  exec uvicorn backend_django.asgi:application --host 0.0.0.0 --port "${PORT:-8000}" --workers "$WORKERS" --no-access-log
+fi
+
 # Gunicorn bind to 0.0.0.0:$PORT for Railway
-exec gunicorn backend_django.wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers 3
+exec gunicorn backend_django.wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers "$WORKERS"